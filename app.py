@@ -38,7 +38,7 @@ This makes it easy and safe to **test different token expiration policies during
 ---
 
 REQUIREMENTS (install with pip):
-    pip install flask flask-cors flask-jwt-extended bcrypt
+    pip install flask flask-jwt-extended bcrypt cachetools orjson "pymongo>=4.2"
 
 DEPENDENCIES:
     - This app expects a dictionary `env_data` passed into `create_app()` with:
@@ -47,13 +47,14 @@ DEPENDENCIES:
         - "JWT_SECRET_KEY": secret string used to sign JWT tokens
         - "JWT_ACCESS_TOKEN_EXPIRES": access token expiry in seconds (int)
         - "JWT_REFRESH_TOKEN_EXPIRES": refresh token expiry in seconds (int)
+        - "BCRYPT_TARGET_MS" (optional): target bcrypt verify time used to pick the work factor, default 250, clamped to 50-1000
         - "db": a MongoDB client instance or other database connection for routes
 
 Overall, this app demonstrates best practices for token lifecycle management in JWT-secured Flask APIs, with added flexibility for live configuration of token expiration policies.
 """
 import bcrypt
 from flask import Flask, request, jsonify, Response
-from flask_cors import CORS
+from flask.json.provider import JSONProvider
 from flask_jwt_extended import (
     JWTManager,
     create_access_token,
@@ -63,17 +64,182 @@ from flask_jwt_extended import (
     get_jwt,
     decode_token
 )
-from jwt import decode as jwt_decode
-from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
-from datetime import timedelta, datetime, timezone
-from collections import OrderedDict
-import json
+from jwt.exceptions import ExpiredSignatureError
+from datetime import timedelta
+from cachetools import TTLCache
+import threading
+import heapq
+import hashlib
+import hmac
+import secrets
+import time
+import decimal
+import logging
+import orjson
+import pymongo
+from hashing import BCRYPT_WAIT_SECONDS, BcryptBusy, bcrypt_pool, bcrypt_slots
+
+logger = logging.getLogger(__name__)
+
+# Keys the entry points load from the Mongo `env` collection into `env_data`
+ENV_KEYS = (
+    "FLASK_USER",
+    "FLASK_PASSWORD",
+    "JWT_SECRET_KEY",
+    "JWT_ACCESS_TOKEN_EXPIRES_SECONDS",
+    "JWT_REFRESH_TOKEN_EXPIRES_SECONDS",
+    "BCRYPT_TARGET_MS",
+)
+
+# MongoClient options the entry points use: a pool big enough that request threads
+# plus the background pools don't queue on checkout, a bounded wait when they do,
+# and compressed wire frames (zlib ships with Python; zstd would need an extra package)
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": 100,
+    "minPoolSize": 10,
+    "waitQueueTimeoutMS": 2000,
+    "compressors": "zlib",
+}
+
+# Total time the Mongo calls of one request (hooks + view) may take. Set per request
+# rather than as a client-wide socketTimeoutMS, so startup index builds and the
+# getMores of streamed responses (which run after the view returns) aren't cut off
+DB_REQUEST_TIMEOUT_SECONDS = 5
+
+# Accepted range for the BCRYPT_TARGET_MS setting
+BCRYPT_TARGET_MS_MIN = 50
+BCRYPT_TARGET_MS_MAX = 1000
+
+# Answer for every CORS preflight; Max-Age lets browsers reuse it for a day
+PREFLIGHT_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+    "Access-Control-Allow-Headers": "Authorization, Content-Type",
+    "Access-Control-Max-Age": "86400",
+}
+
+
+def orjson_default(obj):
+    """
+    Fallback for types orjson doesn't encode natively, matching Flask's default provider.
+    """
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    JSON provider that serializes with orjson, so every `jsonify()` goes through the native encoder.
+    Honors the same `sort_keys` / `compact` switches as Flask's default provider.
+    """
+    sort_keys = True
+    compact = None
+    mimetype = "application/json"
+
+    def _options(self):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=orjson_default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=orjson_default, option=self._options())
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+class DBTimeoutFlask(Flask):
+    """
+    Flask app that runs each request's hooks and view inside `pymongo.timeout()`, so every
+    Mongo call made while handling it shares one DB_REQUEST_TIMEOUT_SECONDS deadline.
+    """
+
+    def full_dispatch_request(self):
+        with pymongo.timeout(DB_REQUEST_TIMEOUT_SECONDS):
+            return super().full_dispatch_request()
+
+
+class CachingJWTManager(JWTManager):
+    """
+    JWTManager that remembers decoded claims per raw token for a short while,
+    so a client hitting several endpoints doesn't pay for HMAC verification + JSON
+    decoding on every request. Expiry is re-checked on each hit; the blocklist
+    loader still runs for every request, so logout/revocation is unaffected.
+    """
+
+    def __init__(self, app=None, maxsize=4096, ttl=60):
+        self.decoded_cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.decoded_cache_lock = threading.Lock()
+        super().__init__(app)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        # Only the plain path is cached; CSRF and allow_expired decodes go straight through
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        with self.decoded_cache_lock:
+            claims = self.decoded_cache.get(encoded_token)
+        if claims is not None and claims.get("exp", float("inf")) > time.time():
+            return dict(claims)
+
+        claims = super()._decode_jwt_from_config(encoded_token)
+        with self.decoded_cache_lock:
+            self.decoded_cache[encoded_token] = claims
+        return dict(claims)
+
+
+def tune_bcrypt_cost(target_ms, min_cost=10, max_cost=16):
+    """
+    Return the lowest bcrypt cost whose hash time on this machine reaches `target_ms`.
+    """
+    for cost in range(min_cost, max_cost + 1):
+        start = time.perf_counter()
+        bcrypt.hashpw(b"x", bcrypt.gensalt(rounds=cost))
+        if (time.perf_counter() - start) * 1000 >= target_ms:
+            return cost
+    return max_cost
+
+
+def bcrypt_hash_cost(pw_hash):
+    """
+    Read the cost from a bcrypt hash string (`$2b$NN$...`), or None if malformed.
+    """
+    try:
+        return int(pw_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return None
 
 
 def create_app(env_data):
-    app = Flask(__name__)
+    app = DBTimeoutFlask(__name__)
+    app.json = OrjsonProvider(app)
+    # Compact, unsorted JSON everywhere (even with debug on): no key sort, no indentation
+    app.json.sort_keys = False
+    app.json.compact = True
     app.debug = True
 
+    # Registered first so preflights are answered before any other hook runs
+    @app.before_request
+    def handle_preflight():
+        if request.method == "OPTIONS":
+            return Response(status=204, headers=PREFLIGHT_HEADERS)
+
+    @app.after_request
+    def add_cors_headers(response):
+        response.headers.setdefault("Access-Control-Allow-Origin", "*")
+        return response
+
     @app.before_request
     def sync_token_expiry():
         db = env_data["db"]["env"]
@@ -101,46 +267,134 @@ def create_app(env_data):
                 pass
 
     app.config["JWT_SECRET_KEY"] = env_data["JWT_SECRET_KEY"]
+    # Pin the signing/verification algorithm so decoding never depends on library defaults
+    app.config["JWT_ALGORITHM"] = "HS256"
+    app.config["JWT_DECODE_ALGORITHMS"] = ["HS256"]
 
     access_exp_sec = int(env_data.get("JWT_ACCESS_TOKEN_EXPIRES", 60))
     refresh_exp_sec = int(env_data.get("JWT_REFRESH_TOKEN_EXPIRES", 300))
-    print(access_exp_sec)
-    print(refresh_exp_sec)
+    logger.debug("Access token expiry: %ss, refresh token expiry: %ss", access_exp_sec, refresh_exp_sec)
 
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(seconds=access_exp_sec)
     app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(seconds=refresh_exp_sec)
 
     app.config["JWT_VERIFY_EXPIRATION"] = True
-    app.config["TOKEN_ISSUED_AFTER"] = datetime.now(tz=timezone.utc).timestamp()
-
-    CORS(app)
 
-    jwt = JWTManager(app)
-
-    valid_user = env_data["FLASK_USER"]
-    valid_pw_hash = env_data["FLASK_PASSWORD"]
-
-    token_blacklist = set()
+    # Tokens come from the Authorization header; only /refresh also reads {"token": ...}
+    # from the JSON body (see its jwt_required below)
+    app.config["JWT_TOKEN_LOCATION"] = ["headers"]
+    app.config["JWT_REFRESH_JSON_KEY"] = "token"
+    app.config["TOKEN_ISSUED_AFTER"] = time.time()
+
+    # Blueprints that read the database per request (routes.users) take it from here
+    app.config["DB"] = env_data["db"]
+
+    jwt = CachingJWTManager(app)
+
+    # Credentials never change per request, so encode them once here
+    valid_user_b = env_data["FLASK_USER"].encode()
+    valid_pw_hash_b = env_data["FLASK_PASSWORD"].encode()
+    valid_pw_cost = bcrypt_hash_cost(env_data["FLASK_PASSWORD"])
+
+    # Like the expiry settings, a bad BCRYPT_TARGET_MS falls back to the default instead
+    # of stopping startup; out-of-range values are clamped
+    try:
+        bcrypt_target_ms = int(env_data.get("BCRYPT_TARGET_MS", 250))
+    except (TypeError, ValueError):
+        bcrypt_target_ms = 250
+    bcrypt_target_ms = min(max(bcrypt_target_ms, BCRYPT_TARGET_MS_MIN), BCRYPT_TARGET_MS_MAX)
+    bcrypt_cost = tune_bcrypt_cost(bcrypt_target_ms)
+    env_data["BCRYPT_COST"] = bcrypt_cost
+    rehash_lock = threading.Lock()
+
+    def rehash_password(password_b):
+        # Upgrade the stored admin hash to the tuned cost; runs off the request thread
+        nonlocal valid_pw_hash_b, valid_pw_cost
+        if not rehash_lock.acquire(blocking=False):
+            return
+        try:
+            new_hash_b = bcrypt.hashpw(password_b, bcrypt.gensalt(rounds=bcrypt_cost))
+            env_data["db"]["env"].update_one({"key": "FLASK_PASSWORD"}, {"$set": {"value": new_hash_b.decode()}})
+            valid_pw_hash_b = new_hash_b
+            valid_pw_cost = bcrypt_cost
+            logger.debug("Admin password rehashed with cost %s", bcrypt_cost)
+        finally:
+            rehash_lock.release()
+
+    # Recent bcrypt results, keyed by an HMAC of the password (never the
+    # password itself) so repeated logins skip the expensive verify.
+    pw_cache = TTLCache(maxsize=1024, ttl=30)
+    pw_cache_lock = threading.Lock()
+    pw_cache_key = secrets.token_bytes(32)
+    # Checks currently running, by the same key; concurrent logins with the
+    # same password wait on one bcrypt run instead of starting their own
+    pw_inflight = {}
+
+    def check_password(password_b):
+        # Returns True/False, or None if no bcrypt slot freed up in time
+        key = hmac.new(pw_cache_key, password_b, hashlib.sha256).digest()
+        with pw_cache_lock:
+            ok = pw_cache.get(key)
+            future = pw_inflight.get(key)
+        if ok is not None:
+            return ok
+        if future is not None:
+            return future.result()
+
+        if not bcrypt_slots.acquire(timeout=BCRYPT_WAIT_SECONDS):
+            return None
+        try:
+            with pw_cache_lock:
+                future = pw_inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = bcrypt_pool.submit(bcrypt.checkpw, password_b, valid_pw_hash_b)
+                    pw_inflight[key] = future
+            if not leader:
+                return future.result()
+            try:
+                ok = future.result()
+                with pw_cache_lock:
+                    pw_cache[key] = ok
+                return ok
+            finally:
+                with pw_cache_lock:
+                    pw_inflight.pop(key, None)
+        finally:
+            bcrypt_slots.release()
+
+    # Revoked jti -> token exp, plus a min-heap of (exp, jti). A token past its exp
+    # is rejected anyway, so each revocation pops the expired entries off the top of
+    # the heap and drops them from the map; only those entries are touched.
+    token_blacklist = {}
+    token_expiry_heap = []
+    token_blacklist_lock = threading.Lock()
+
+    def revoke_token(jti, exp):
+        now = time.time()
+        with token_blacklist_lock:
+            while token_expiry_heap and token_expiry_heap[0][0] < now:
+                _, old_jti = heapq.heappop(token_expiry_heap)
+                token_blacklist.pop(old_jti, None)
+            token_blacklist[jti] = exp
+            if exp is not None:
+                heapq.heappush(token_expiry_heap, (exp, jti))
 
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
+        # Signature and exp are already verified by Flask-JWT-Extended before this runs
         jti = jwt_payload.get("jti")
-        exp = jwt_payload.get("exp")
         iat = jwt_payload.get("iat", 0)
-        now = datetime.now(tz=timezone.utc).timestamp()
+        cutoff = app.config["TOKEN_ISSUED_AFTER"]
 
-        print(f"DEBUG: Now={now}, Token exp={exp}, Token iat={iat}, Cutoff={app.config['TOKEN_ISSUED_AFTER']}, jti={jti}")
+        logger.debug("Token iat=%s, Cutoff=%s, jti=%s", iat, cutoff, jti)
 
         if jti in token_blacklist:
-            print(f"DEBUG: Token revoked: jti={jti}")
+            logger.debug("Token revoked: jti=%s", jti)
             return True
 
-        if exp is not None and exp < now:
-            print("DEBUG: Token expired (manual expiration check)")
-            return True
-
-        if iat < app.config["TOKEN_ISSUED_AFTER"]:
-            print("DEBUG: Token issued before cutoff, reject")
+        if iat < cutoff:
+            logger.debug("Token issued before cutoff, reject")
             return True
 
         return False
@@ -148,64 +402,88 @@ def create_app(env_data):
     @app.route("/logout", methods=["POST"])
     @jwt_required()
     def logout():
-        jti = get_jwt().get("jti")
-        token_blacklist.add(jti)
-        print(f"DEBUG: Token revoked and added to blacklist: jti={jti}")
+        claims = get_jwt()
+        jti = claims.get("jti")
+        revoke_token(jti, claims.get("exp"))
+        logger.debug("Token revoked and added to blacklist: jti=%s", jti)
         return jsonify(msg="Logged out successfully"), 200
 
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
-        print("DEBUG: Expired token detected (expired_token_loader)")
+        logger.debug("Expired token detected (expired_token_loader)")
         return jsonify(msg="❌ Token expired"), 401
 
     @jwt.invalid_token_loader
     def invalid_token_callback(err_msg):
-        print(f"DEBUG: Invalid token: {err_msg} (invalid_token_loader)")
+        logger.debug("Invalid token: %s (invalid_token_loader)", err_msg)
         return jsonify(msg="❌ Invalid token"), 422
 
     @jwt.unauthorized_loader
     def unauthorized_callback(err_msg):
-        print(f"DEBUG: Missing token: {err_msg} (unauthorized_loader)")
+        logger.debug("Missing token: %s (unauthorized_loader)", err_msg)
         return jsonify(msg="❌ Missing token"), 401
 
     @jwt.revoked_token_loader
     def revoked_token_callback(jwt_header, jwt_payload):
-        print("DEBUG: Revoked token detected (revoked_token_loader)")
+        logger.debug("Revoked token detected (revoked_token_loader)")
         return jsonify(msg="❌ Token revoked"), 401
 
+    @app.errorhandler(BcryptBusy)
+    def handle_bcrypt_busy(e):
+        logger.debug("No bcrypt slot available")
+        return jsonify(msg="❌ Server busy, try again later"), 503
+
     @app.errorhandler(ExpiredSignatureError)
     def handle_expired_error(e):
-        print("DEBUG: Token expired error caught (from PyJWT)")
+        logger.debug("Token expired error caught (from PyJWT)")
         return jsonify(msg="❌ Token expired"), 401
 
     @app.route("/")
     def index():
-        print("DEBUG: Index route called")
+        logger.debug("Index route called")
         return jsonify(msg="Flask API is running")
 
     @app.route("/login", methods=["POST"])
     def login():
-        print("DEBUG: Login route called")
-        data = request.get_json()
-        print(f"DEBUG: Login payload: {data}")
-        username = data.get("username")
-        password = data.get("password")
-
-        if username != valid_user:
-            print("DEBUG: Invalid username")
+        logger.debug("Login route called")
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            logger.debug("Login body is not a JSON object")
+            return jsonify(msg="Invalid credentials"), 401
+        username = data.get("username") or ""
+        password = data.get("password") or ""
+        if not isinstance(username, str) or not isinstance(password, str):
+            logger.debug("Login username/password is not a string")
             return jsonify(msg="Invalid credentials"), 401
 
-        if not bcrypt.checkpw(password.encode(), valid_pw_hash.encode()):
-            print("DEBUG: Invalid password")
+        # Compare in constant time and always run the password check, so an
+        # unknown username takes as long as a wrong password
+        password_b = password.encode()
+        user_ok = hmac.compare_digest(username.encode(), valid_user_b)
+        password_ok = check_password(password_b)
+
+        if password_ok is None:
+            logger.debug("No bcrypt slot available")
+            return jsonify(msg="❌ Server busy, try again later"), 503
+
+        if not user_ok:
+            logger.debug("Invalid username")
             return jsonify(msg="Invalid credentials"), 401
 
+        if not password_ok:
+            logger.debug("Invalid password")
+            return jsonify(msg="Invalid credentials"), 401
+
+        if (valid_pw_cost or 0) < bcrypt_cost:
+            threading.Thread(target=rehash_password, args=(password_b,), daemon=True).start()
+
         access_token = create_access_token(identity=username)
         refresh_token = create_refresh_token(identity=username)
 
-        decoded_access = decode_token(access_token)
-        print("DEBUG: Access token decoded payload:", decoded_access)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Access token decoded payload: %s", decode_token(access_token))
 
-        print(f"DEBUG: Tokens issued for user {username}")
+        logger.debug("Tokens issued for user %s", username)
         return jsonify(
             access_token=access_token,
             refresh_token=refresh_token,
@@ -216,41 +494,18 @@ def create_app(env_data):
         )
 
     @app.route("/refresh", methods=["POST"])
+    @jwt_required(refresh=True, locations=["headers", "json"])
     def refresh():
-        print("DEBUG: Refresh route called")
-        data = request.get_json()
-        token = data.get("token", None)
-        print(f"DEBUG: Token received in JSON body: {token}")
-
-        if not token:
-            print("DEBUG: Missing token in JSON body")
-            return jsonify(msg="❌ Missing token in JSON body"), 401
-
-        try:
-            decoded = jwt_decode(token, app.config["JWT_SECRET_KEY"], algorithms=["HS256"])
-            print(f"DEBUG: Refresh token decoded: {decoded}")
-            if decoded.get("type") != "refresh":
-                print("DEBUG: Token is not a refresh token")
-                return jsonify(msg="❌ Token is not a refresh token"), 422
-            if decoded.get("jti") in token_blacklist:
-                print(f"DEBUG: Refresh token revoked: jti={decoded.get('jti')}")
-                return jsonify(msg="❌ Token revoked"), 401
-        except ExpiredSignatureError:
-            print("DEBUG: Refresh token expired")
-            return jsonify(msg="❌ Token expired"), 401
-        except InvalidTokenError as e:
-            print(f"DEBUG: Refresh token invalid: {str(e)}")
-            return jsonify(msg="❌ Invalid token"), 422
-
-        new_access_token = create_access_token(identity=decoded["sub"])
-        print("DEBUG: New access token issued")
+        # Signature, expiry, token type and revocation are all checked by jwt_required
+        new_access_token = create_access_token(identity=get_jwt_identity())
+        logger.debug("New access token issued")
         return jsonify(access_token=new_access_token)
 
     @app.route("/protected", methods=["GET"])
     @jwt_required()
     def protected():
         user = get_jwt_identity()
-        print(f"DEBUG: Access token valid for user {user}")
+        logger.debug("Access token valid for user %s", user)
         return jsonify(msg=f"Hello {user}, access granted")
 
     from routes.stores import stores_bp, init_store_routes
@@ -273,5 +528,5 @@ def create_app(env_data):
     init_admin_routes(env_data["db"])
     app.register_blueprint(admin_bp, url_prefix="/admin")
 
-    print("DEBUG: App created and routes registered")
+    logger.debug("App created and routes registered")
     return app
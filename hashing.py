@@ -0,0 +1,35 @@
+"""
+hashing.py — One bounded home for bcrypt work, shared by app.py and the route blueprints
+
+bcrypt is pure CPU, so each worker process allows at most one hash/verify per core at a
+time. Callers wait up to BCRYPT_WAIT_SECONDS for a slot and get `BcryptBusy` (answered
+with a 503 by the app) instead of queueing without bound when /login or the password
+endpoints are flooded.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import os
+
+BCRYPT_WORKERS = os.cpu_count() or 1
+BCRYPT_WAIT_SECONDS = 2
+bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS)
+bcrypt_slots = threading.BoundedSemaphore(BCRYPT_WORKERS)
+
+
+class BcryptBusy(Exception):
+    """No bcrypt slot freed up within BCRYPT_WAIT_SECONDS."""
+
+
+def run_bcrypt(fn, *args):
+    """
+    Runs a bcrypt call (`bcrypt.hashpw` / `bcrypt.checkpw`) on the calling thread once a
+    slot is free and returns its result; raises BcryptBusy if none frees up in time.
+    bcrypt releases the GIL, so handing it to bcrypt_pool would only add a thread hop;
+    the pool is for /login, where concurrent checks of one password share a future.
+    """
+    if not bcrypt_slots.acquire(timeout=BCRYPT_WAIT_SECONDS):
+        raise BcryptBusy()
+    try:
+        return fn(*args)
+    finally:
+        bcrypt_slots.release()
@@ -27,14 +27,17 @@ import asyncio
 # Access to environment variables like DB user/pass
 import os
 
+# Debug output for local runs (wsgi.py keeps production at WARNING)
+import logging
+
 # MongoDB client + connection error types
 from pymongo import MongoClient, errors
 
 # Load .env file automatically
 from dotenv import load_dotenv
 
-# Import the app factory function from app.py
-from app import create_app
+# Import the app factory function and the env keys it needs from app.py
+from app import create_app, ENV_KEYS, MONGO_CLIENT_OPTIONS
 
 # For safe encoding of special characters in MongoDB password
 from urllib.parse import quote_plus
@@ -42,26 +45,34 @@ from urllib.parse import quote_plus
 # Load environment variables from `.env` into memory
 load_dotenv()
 
+# Show the app's debug log lines when running locally (without pymongo's)
+logging.basicConfig(level=logging.INFO)
+logging.getLogger("app").setLevel(logging.DEBUG)
+
 
-async def wait_for_mongo(uri, retries=5, delay=2):
+async def wait_for_mongo(uri, retries=8, delay=0.1):
     """
     Try to connect to MongoDB with retries.
 
-    If the DB is not yet ready (e.g. in Docker), it will retry every `delay` seconds
-    up to `retries` times.
+    If the DB is not yet ready (e.g. in Docker), it will retry up to `retries` times,
+    waiting `delay` seconds after the first failed probe and doubling the wait each time
+    (0.1, 0.2, 0.4, ... ~25s in total), so a DB that is only briefly late costs
+    milliseconds instead of a fixed multi-second sleep.
     """
     for _ in range(retries):
+        # Create the client (pool/compression options from app.py) with a short timeout
+        client = MongoClient(uri, serverSelectionTimeoutMS=500, **MONGO_CLIENT_OPTIONS)
         try:
-            # Create a test client with a short timeout
-            client = MongoClient(uri, serverSelectionTimeoutMS=2000)
-
-            # Try to ping the server
-            client.admin.command("ping")
+            # Try to ping the server; pymongo blocks, so run it in a worker thread
+            # instead of stalling the event loop
+            await asyncio.to_thread(client.admin.command, "ping")
             return client
 
         except errors.ServerSelectionTimeoutError:
-            # Wait before trying again
+            # Drop this client's monitor threads, then back off before trying again
+            client.close()
             await asyncio.sleep(delay)
+            delay *= 2
 
     # After all retries fail, raise a fatal error
     raise Exception("MongoDB not available")
@@ -91,8 +102,13 @@ async def start():
     # Connect to specific DB
     db = client["peoplecount"]
 
-    # Load all secrets as key-value pairs into a Python dict
-    env_data = {doc["key"]: doc["value"] for doc in db.env.find({})}
+    # Load only the secrets the app uses, projected to key/value, in a single batch
+    cursor = db.env.find(
+        {"key": {"$in": list(ENV_KEYS)}},
+        {"_id": 0, "key": 1, "value": 1}
+    ).batch_size(len(ENV_KEYS))
+    env_docs = await asyncio.to_thread(list, cursor)
+    env_data = {doc["key"]: doc["value"] for doc in env_docs}
 
     # Inject DB itself for use in routes (e.g. /stores)
     env_data["db"] = db
@@ -112,7 +128,8 @@ async def start():
     # Create Flask app with those secrets including expiry times as ints
     app = create_app(env_data)
 
-    # Start the web server
+    # Start the web server (dev server, stays on the main thread for the debug reloader;
+    # production runs wsgi.py under gunicorn)
     app.run(host="localhost", port=5000)
 
 
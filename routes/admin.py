@@ -6,7 +6,7 @@ access and refresh token expiration times during runtime.
 
 Security features:
 - Requires HTTP Basic Auth with username and bcrypt-hashed password
-  loaded from your database environment variables.
+  loaded from your database environment variables (cached in memory for 5 minutes).
 - Access allowed **only from localhost** (127.0.0.1 or ::1)
 - Rejects remote IPs with clear message: "You are using a remote machine and this is only allowed from localhost"
 - Validates and converts user-friendly time inputs (seconds, minutes, hours, days) to seconds
@@ -24,16 +24,49 @@ and invalidates all previously issued tokens to enforce new expirations immediat
 
 from flask import Blueprint, request, jsonify, current_app
 from functools import wraps
-from datetime import datetime, timezone, timedelta
+from pymongo import UpdateOne
+from datetime import timedelta
+from cachetools import TTLCache
+import threading
+import hmac
 import bcrypt
+from hashing import run_bcrypt
+import time
 
 admin_bp = Blueprint("admin", __name__)
 env_collection = None  # will be initialized from main app
 
+# Admin credentials change rarely, so keep them in memory instead of hitting Mongo per request
+credentials_cache = TTLCache(maxsize=1, ttl=300)
+credentials_lock = threading.Lock()
+
 
 def init_admin_routes(db):
     global env_collection
     env_collection = db["env"]
+    load_admin_credentials()
+
+
+def load_admin_credentials():
+    """
+    Returns (username, password_hash) for the admin from the env collection.
+    Both are fetched in one query and cached; a missing value comes back as None and is not cached.
+    """
+    with credentials_lock:
+        creds = credentials_cache.get("admin")
+    if creds is None:
+        docs = {
+            doc["key"]: doc["value"]
+            for doc in env_collection.find(
+                {"key": {"$in": ["FLASK_USER", "FLASK_PASSWORD"]}},
+                {"_id": 0, "key": 1, "value": 1}
+            )
+        }
+        creds = (docs.get("FLASK_USER"), docs.get("FLASK_PASSWORD"))
+        if all(creds):
+            with credentials_lock:
+                credentials_cache["admin"] = creds
+    return creds
 
 
 def basic_auth_required(fn):
@@ -43,17 +76,16 @@ def basic_auth_required(fn):
         if not auth or not auth.username or not auth.password:
             return jsonify(msg="❌ Missing or invalid authentication"), 401, {"WWW-Authenticate": 'Basic realm="Login required"'}
 
-        # Fetch admin credentials directly from env collection
-        user_doc = env_collection.find_one({"key": "FLASK_USER"})
-        pw_doc = env_collection.find_one({"key": "FLASK_PASSWORD"})
+        admin_user, admin_pw_hash = load_admin_credentials()
 
-        if not user_doc or not pw_doc:
+        if not admin_user or not admin_pw_hash:
             return jsonify(msg="❌ Admin credentials not found in database"), 500
 
-        if auth.username != user_doc["value"]:
-            return jsonify(msg="❌ Invalid username or password"), 403
+        # Constant-time username compare, and bcrypt runs either way so timing doesn't reveal which part was wrong
+        user_ok = hmac.compare_digest(auth.username.encode(), admin_user.encode())
+        password_ok = run_bcrypt(bcrypt.checkpw, auth.password.encode(), admin_pw_hash.encode())
 
-        if not bcrypt.checkpw(auth.password.encode(), pw_doc["value"].encode()):
+        if not user_ok or not password_ok:
             return jsonify(msg="❌ Invalid username or password"), 403
 
         return fn(*args, **kwargs)
@@ -70,31 +102,37 @@ def local_only(fn):
     return wrapper
 
 
+# "<prefix>_<unit>" keys and their multipliers, built once instead of per call
+TIME_UNITS = (("second", 1), ("minute", 60), ("hour", 3600), ("day", 86400))
+TIME_KEYS = {
+    prefix: tuple((f"{prefix}_{unit}", mult) for unit, mult in TIME_UNITS)
+    for prefix in ("access", "refresh")
+}
+
+
 def time_to_seconds(data, prefix):
     """
     Converts a time specification from data dict into seconds.
     Accepts keys like 'second', 'minute', 'hour', 'day' prefixed by prefix.
     Returns total seconds or None if no valid input.
     """
-    multipliers = {
-        'second': 1,
-        'minute': 60,
-        'hour': 3600,
-        'day': 86400
-    }
+    keys = TIME_KEYS.get(prefix)
+    if keys is None:
+        keys = tuple((f"{prefix}_{unit}", mult) for unit, mult in TIME_UNITS)
     total = 0
     found = False
-    for unit, mult in multipliers.items():
-        key = f"{prefix}_{unit}"
+    for key, mult in keys:
         if key in data:
-            try:
-                val = int(data[key])
-                if val < 0:
-                    return None  # negative invalid
-                total += val * mult
-                found = True
-            except (ValueError, TypeError):
-                return None  # invalid int conversion
+            val = data[key]
+            if not isinstance(val, int):
+                try:
+                    val = int(val)
+                except (ValueError, TypeError):
+                    return None  # invalid int conversion
+            if val < 0:
+                return None  # negative invalid
+            total += val * mult
+            found = True
     return total if found else None
 
 
@@ -110,21 +148,28 @@ def set_token_expiry():
     if access_seconds is None and refresh_seconds is None:
         return jsonify(msg="❌ Must provide at least one valid access_* or refresh_* time parameter (second/minute/hour/day)"), 400
 
+    ops = []
+
     if access_seconds is not None:
         current_app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(seconds=access_seconds)
-        env_collection.update_one(
+        ops.append(UpdateOne(
             {"key": "JWT_ACCESS_TOKEN_EXPIRES_SECONDS"},
-            {"$set": {"value": str(access_seconds)}}
-        )
+            {"$set": {"value": str(access_seconds)}},
+            upsert=True
+        ))
 
     if refresh_seconds is not None:
         current_app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(seconds=refresh_seconds)
-        env_collection.update_one(
+        ops.append(UpdateOne(
             {"key": "JWT_REFRESH_TOKEN_EXPIRES_SECONDS"},
-            {"$set": {"value": str(refresh_seconds)}}
-        )
+            {"$set": {"value": str(refresh_seconds)}},
+            upsert=True
+        ))
+
+    # Both settings go to Mongo in a single round trip
+    env_collection.bulk_write(ops, ordered=False)
 
-    current_app.config["TOKEN_ISSUED_AFTER"] = datetime.now(tz=timezone.utc).timestamp()
+    current_app.config["TOKEN_ISSUED_AFTER"] = time.time()
 
     return jsonify(
         msg="✅ Token expiry updated and old tokens invalidated",
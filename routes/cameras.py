@@ -1,33 +1,193 @@
 from flask import Blueprint, request, jsonify, Response
 from flask_jwt_extended import jwt_required
-from collections import OrderedDict
-import re
-import json
-from urllib.parse import urlparse
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.write_concern import WriteConcern
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+import orjson
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+import string
+import logging
 import bcrypt
+from hashing import run_bcrypt
+from validation import norm
+from routes.stores import store_exists, existing_store_names
 
 cameras_bp = Blueprint("cameras", __name__)
 
-# URL regex to validate URLs with port (supports http, https, ws, wss)
-url_regex = re.compile(
-    r"^(https?|wss?):\/\/"               # scheme
-    r"(([A-Z0-9\-\.]+)|(\[[A-F0-9:]+\]))"  # domain or IPv6
-    r":(\d+)"                           # port (mandatory)
-    r"(\/.*)?$",                       # optional path
-    re.IGNORECASE
-)
+logger = logging.getLogger(__name__)
+
+# Camera password hashing: fixed bcrypt cost (bcrypt's own default)
+CAMERA_PW_ROUNDS = 12
+
+# Camera/store sync writes hit two collections; the standalone MongoDB has no
+# transactions, so the store-side write runs here in parallel with the camera write
+sync_pool = ThreadPoolExecutor(max_workers=4)
+
+# update_camera's store sync runs after the response on a single thread, so syncs
+# apply one at a time in the order they were queued
+rename_sync_pool = ThreadPoolExecutor(max_workers=1)
+
+
+def _sync_camera_into_stores(db, stores_fast, cam_id):
+    """
+    Copies the camera's current url/name into every store entry for it, matched by _id.
+    Reading the camera here (not using the values from the request that queued the sync)
+    means whichever sync runs last writes the latest state, even after quick successive renames.
+    """
+    cam = db.cameras.find_one({"_id": cam_id}, {"_id": 0, "url": 1, "name": 1})
+    if cam is None:
+        return
+    stores_fast.update_many(
+        {"cameras._id": cam_id},
+        {"$set": {"cameras.$[c].url": cam["url"], "cameras.$[c].name": cam.get("name", "")}},
+        array_filters=[{"c._id": cam_id}]
+    )
+
+
+def _log_sync_failure(future):
+    """Done-callback for fire-and-forget store syncs, which have no caller to raise to."""
+    error = future.exception()
+    if error is not None:
+        logger.error("Background store sync failed: %s", error)
+
+# URL validation (supports http, https, ws, wss; port is mandatory)
+url_schemes = frozenset(("http", "https", "ws", "wss"))
+host_chars = frozenset(string.ascii_letters + string.digits + "-.")
+ipv6_chars = frozenset(string.hexdigits + ":")
+
+# Upper bound on cameras per POST /cameras/bulk request
+MAX_BULK_CAMERAS = 1000
+
+# Largest request bodies parsed as JSON (single camera / bulk)
+MAX_BODY_BYTES = 64_000
+MAX_BULK_BODY_BYTES = 1_000_000
+
+# Fields update_camera accepts
+updatable_keys = frozenset(("name", "username", "password", "new_url"))
+
+
+# Fixed error bodies, encoded once at import instead of on every bad request
+ERR_EMPTY_BODY = orjson.dumps({"msg": "❌ Body cannot be empty"})
+ERR_INVALID_JSON = orjson.dumps({"msg": "❌ Body must be a JSON object"})
+ERR_TOO_LARGE = orjson.dumps({"msg": "❌ Request body too large"})
+ERR_BULK_LIST = orjson.dumps({"msg": "❌ 'cameras' must be a non-empty list"})
+ERR_STORES_FIELD = orjson.dumps({"msg": "❌ Camera stores list can be edited in camera/stores endpoint"})
+ERR_URL_REQUIRED = orjson.dumps({"msg": "❌ 'url' or 'current_url' is required to identify the camera"})
+ERR_NO_FIELDS = orjson.dumps({"msg": "❌ No valid fields provided to update"})
+ERR_URL_STORE_REQUIRED = orjson.dumps({"msg": "❌ 'url' and 'store' are required"})
+
+
+def _error(body, status=400):
+    """Wraps a pre-encoded error body in a JSON response."""
+    return Response(body, mimetype="application/json", status=status)
+
+
+def _read_json(max_bytes=MAX_BODY_BYTES):
+    """
+    Returns (data, error_response). An oversized body gets a 413 and a malformed or
+    non-object body a 400; an empty body gives (None, None) so each route reports it
+    its own way. A declared length is checked before anything is read, and a chunked
+    body (no Content-Length) is read only up to the limit.
+    """
+    length = request.content_length
+    if length is None:
+        raw = request.stream.read(max_bytes + 1)
+        if len(raw) > max_bytes:
+            return None, _error(ERR_TOO_LARGE, 413)
+    elif length > max_bytes:
+        return None, _error(ERR_TOO_LARGE, 413)
+    else:
+        raw = request.get_data(cache=False) if length else b""
+    if not raw:
+        return None, None
+    if not request.is_json:
+        return None, _error(ERR_INVALID_JSON)
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return None, _error(ERR_INVALID_JSON)
+    if not isinstance(data, dict):
+        return None, _error(ERR_INVALID_JSON)
+    return data, None
+
+
+def validate_camera_payload(data):
+    """
+    Validates and normalizes a create_camera body in one pass.
+    Returns (error_msg, None) on failure or (None, fields) with the camera
+    document fields.
+    """
+    fields = {}
+    for key in ("url", "username", "password"):
+        value = data.get(key)
+        value = value.strip() if isinstance(value, str) else ""
+        if not value:
+            return f"❌ '{key}' is required", None
+        fields[key] = value
+
+    if not is_valid_url(fields["url"]):
+        return "❌ 'url' must be a valid URL including port, e.g. http://192.168.1.100:554", None
+
+    fields["url"] = fields["url"].upper()
+    fields["store"] = norm(data.get("store")) or None
+    fields["name"] = norm(data.get("name"))
+    return None, fields
+
+
+def is_valid_url(url):
+    """
+    Checks `url` is scheme://host:port[/path] with a supported scheme, a domain,
+    IPv4 or [IPv6] host and an explicit numeric port.
+    Splits the URL once instead of running a backtracking regex over it.
+    """
+    if any(c in url for c in "\t\r\n"):
+        return False  # urlsplit silently drops these
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return False  # unbalanced IPv6 brackets, non-numeric or out-of-range port
+    if parts.scheme not in url_schemes or port is None:
+        return False
+    if not parts.path and (parts.query or parts.fragment):
+        return False  # anything after the port must start with "/"
+
+    host = parts.hostname
+    if not host or "@" in parts.netloc:
+        return False
+    if parts.netloc.startswith("["):
+        # nothing may sit between "]" and the port
+        return parts.netloc.rpartition(":")[0].endswith("]") and set(host) <= ipv6_chars
+    return set(host) <= host_chars
 
 def init_camera_routes(db):
+    # Indexes for the lookups below (create_index is a no-op if they already exist)
+    db.cameras.create_index("url", unique=True)
+    db.stores.create_index("cameras._id")   # store sync in update_camera (matches by camera _id)
+    # The old cameras.url index no longer serves any query but still costs a write per store update
+    if "cameras.url_1" in db.stores.index_information():
+        db.stores.drop_index("cameras.url_1")
+
+    # Acknowledged but unjournaled writes for the background store sync
+    stores_fast = db.stores.with_options(write_concern=WriteConcern(w=1, j=False))
+
     #get cameras
     @cameras_bp.route("/cameras", methods=["GET"])
     @jwt_required()
     def get_all_cameras():
-        cameras = db.cameras.find({}, {"_id": 1, "url": 1, "stores": 1, "name": 1})
-        result = []
-        for cam in cameras:
-            cam["_id"] = str(cam["_id"])  # Convert ObjectId to string for JSON
-            result.append(cam)
-        return jsonify(result)
+        cameras = db.cameras.find({}, {"_id": 1, "url": 1, "stores": 1, "name": 1}).batch_size(1000)
+
+        # Stream the array one camera at a time instead of building the whole list
+        def stream():
+            sep = b"["
+            for cam in cameras:
+                cam["_id"] = str(cam["_id"])  # Convert ObjectId to string for JSON
+                yield sep + orjson.dumps(cam)
+                sep = b","
+            yield b"[]" if sep == b"[" else b"]"
+
+        return Response(stream(), mimetype="application/json")
 
 
 
@@ -75,45 +235,33 @@ def init_camera_routes(db):
     @cameras_bp.route("/cameras", methods=["POST"])
     @jwt_required()
     def create_camera():
-        data = request.get_json()
-
-        if not data or not isinstance(data, dict) or data == {}:
-            return jsonify(msg="❌ Body cannot be empty"), 400
+        data, error = _read_json()
+        if error:
+            return error
+        if not data:
+            return _error(ERR_EMPTY_BODY)
 
-        url = data.get("url", "").strip()
-        username = data.get("username", "").strip()
-        password = data.get("password", "").strip()
-        store_name = data.get("store", "").strip()
-        name = data.get("name", "").strip()
+        error, fields = validate_camera_payload(data)
+        if error:
+            return jsonify(msg=error), 400
 
-        if not url:
-            return jsonify(msg="❌ 'url' is required"), 400
-        if not username:
-            return jsonify(msg="❌ 'username' is required"), 400
-        if not password:
-            return jsonify(msg="❌ 'password' is required"), 400
+        normalized_url = fields["url"]
+        normalized_store = fields["store"]
+        normalized_name = fields["name"]
 
-        if not url_regex.match(url):
-            return jsonify(msg="❌ 'url' must be a valid URL including port, e.g. http://192.168.1.100:554"), 400
-
-        normalized_url = url.upper()
-        normalized_store = store_name.upper() if store_name else None
-        normalized_name = name.upper() if name else ""
-
-        if db.cameras.find_one({"url": normalized_url}):
+        if db.cameras.find_one({"url": normalized_url}, {"_id": 1}):
             return jsonify(msg=f"❌ Camera with URL '{normalized_url}' already exists"), 409
 
         stores_list = []
         if normalized_store:
-            store_doc = db.stores.find_one({"name": normalized_store})
-            if not store_doc:
+            if not store_exists(db, normalized_store):
                 return jsonify(msg=f"❌ Store '{normalized_store}' not found. Create store before adding camera."), 404
             stores_list.append(normalized_store)
 
         camera_doc = {
             "url": normalized_url,
-            "username": username,
-            "password": password,
+            "username": fields["username"],
+            "password": fields["password"],
             "stores": stores_list,
             "name": normalized_name
         }
@@ -133,20 +281,148 @@ def init_camera_routes(db):
                 }}
             )
 
-        ordered_camera = OrderedDict()
-        ordered_camera["_id"] = str(camera_id)
-        ordered_camera["url"] = camera_doc["url"]
-        ordered_camera["username"] = camera_doc["username"]
-        ordered_camera["password"] = camera_doc["password"]
-        ordered_camera["stores"] = camera_doc["stores"]
-        ordered_camera["name"] = camera_doc["name"]
+        # Plain dicts keep insertion order, so the field order is still fixed
+        camera = {
+            "_id": str(camera_id),
+            "url": camera_doc["url"],
+            "username": camera_doc["username"],
+            "password": camera_doc["password"],
+            "stores": camera_doc["stores"],
+            "name": camera_doc["name"]
+        }
 
         return Response(
-            json.dumps({"msg": "✅ Camera created", "camera": ordered_camera}),
+            orjson.dumps({"msg": "✅ Camera created", "camera": camera}),
             mimetype="application/json",
             status=201
         )
 
+    """
+    Creates many cameras in one request. Body: `{"cameras": [ ... ]}` where each entry takes the
+    same fields as POST /cameras (`url`, `username`, `password`, optional `name`, `store`).
+
+    Every entry is validated first; duplicates are found with a single `$in` query, the new
+    cameras are written with one `insert_many` and the store references with one `bulk_write`.
+    Entries that fail validation or whose URL already exists are reported back instead of
+    failing the whole batch (at most 1000 cameras per request).
+
+    Example:
+    curl -X POST https://116.203.203.86/cameras/bulk
+      -H "Authorization: Bearer <JWT_TOKEN>" \
+      -H "Content-Type: application/json" \
+      -d '{
+        "cameras": [
+          {"url": "http://192.168.1.100:554", "username": "admin", "password": "pass123", "store": "MAIN STORE"},
+          {"url": "http://192.168.1.101:554", "username": "admin", "password": "pass123", "name": "Back Door"}
+        ]
+      }'
+    """
+    @cameras_bp.route("/cameras/bulk", methods=["POST"])
+    @jwt_required()
+    def create_cameras_bulk():
+        data, error = _read_json(MAX_BULK_BODY_BYTES)
+        if error:
+            return error
+        entries = data.get("cameras") if data else None
+
+        if not entries or not isinstance(entries, list):
+            return _error(ERR_BULK_LIST)
+        if len(entries) > MAX_BULK_CAMERAS:
+            return jsonify(msg=f"❌ At most {MAX_BULK_CAMERAS} cameras per request"), 400
+
+        errors = []
+        duplicates = []
+        candidates = {}  # url -> validated fields, first entry wins
+
+        validated = []
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                errors.append({"index": index, "msg": "❌ Entry must be an object"})
+                continue
+            error, fields = validate_camera_payload(entry)
+            if error:
+                errors.append({"index": index, "msg": error})
+            else:
+                validated.append((index, fields))
+
+        # One round trip for every referenced store
+        known_stores = existing_store_names(db, {f["store"] for _, f in validated if f["store"]})
+
+        for index, fields in validated:
+            if fields["store"] and fields["store"] not in known_stores:
+                errors.append({
+                    "index": index,
+                    "msg": f"❌ Store '{fields['store']}' not found. Create store before adding camera."
+                })
+            elif fields["url"] in candidates:
+                duplicates.append(fields["url"])
+            else:
+                candidates[fields["url"]] = fields
+        errors.sort(key=lambda e: e["index"])
+
+        # One round trip for every URL that already exists
+        if candidates:
+            for doc in db.cameras.find({"url": {"$in": list(candidates)}}, {"_id": 0, "url": 1}):
+                duplicates.append(doc["url"])
+                del candidates[doc["url"]]
+
+        new_docs = [
+            {
+                "url": f["url"],
+                "username": f["username"],
+                "password": f["password"],
+                "stores": [f["store"]] if f["store"] else [],
+                "name": f["name"]
+            }
+            for f in candidates.values()
+        ]
+
+        if new_docs:
+            # insert_many fills in each doc's _id; anything racing in since the $in
+            # query is rejected by the unique url index and reported as a duplicate
+            try:
+                db.cameras.insert_many(new_docs, ordered=False)
+            except BulkWriteError as e:
+                write_errors = e.details.get("writeErrors", [])
+                # Only duplicate-key errors are expected here; anything else is a real failure
+                if any(err.get("code") != 11000 for err in write_errors):
+                    raise
+                failed = {err["index"] for err in write_errors}
+                duplicates.extend(new_docs[i]["url"] for i in sorted(failed))
+                new_docs = [doc for i, doc in enumerate(new_docs) if i not in failed]
+
+        # One $addToSet per store, all sent in a single bulk_write
+        store_refs = {}
+        for doc in new_docs:
+            for store_name in doc["stores"]:
+                store_refs.setdefault(store_name, []).append(
+                    {"name": doc["name"], "_id": doc["_id"], "url": doc["url"]}
+                )
+        if store_refs:
+            db.stores.bulk_write(
+                [
+                    UpdateOne({"name": name}, {"$addToSet": {"cameras": {"$each": refs}}})
+                    for name, refs in store_refs.items()
+                ],
+                ordered=False
+            )
+
+        created = [
+            {"_id": str(doc["_id"]), "url": doc["url"], "stores": doc["stores"], "name": doc["name"]}
+            for doc in new_docs
+        ]
+
+        return Response(
+            orjson.dumps({
+                "msg": f"✅ {len(created)} camera(s) created",
+                "created": created,
+                "duplicates": duplicates,
+                "errors": errors
+            }),
+            mimetype="application/json",
+            status=201 if created else 400
+        )
+
         
     """
     This endpoint updates a camera by its `url`. Use `"url"` when you're not changing the URL,
@@ -181,61 +457,66 @@ def init_camera_routes(db):
     @cameras_bp.route("/cameras", methods=["PUT"])
     @jwt_required()
     def update_camera():
-        data = request.get_json()
-        if not data or not isinstance(data, dict):
-            return jsonify(msg="❌ Body cannot be empty"), 400
+        data, error = _read_json()
+        if error:
+            return error
+        if not data:
+            return _error(ERR_EMPTY_BODY)
 
         if "stores" in data:
-            return jsonify(msg="❌ Camera stores list can be edited in camera/stores endpoint"), 400
+            return _error(ERR_STORES_FIELD)
 
         # Determine which field to identify the camera by
-        camera_url = data.get("current_url") or data.get("url")
-        if not camera_url:
-            return jsonify(msg="❌ 'url' or 'current_url' is required to identify the camera"), 400
-        normalized_url = camera_url.strip().upper()
-
-        # Load the original camera doc
-        camera_doc = db.cameras.find_one({"url": normalized_url})
-        if not camera_doc:
-            return jsonify(msg=f"❌ Camera with URL '{normalized_url}' not found"), 404
+        normalized_url = norm(data.get("current_url") or data.get("url"))
+        if not normalized_url:
+            return _error(ERR_URL_REQUIRED)
 
-        allowed_keys = {"name", "username", "password", "new_url"}
         update_data = {}
 
         for key, value in data.items():
-            if key not in allowed_keys:
+            if key not in updatable_keys:
                 continue
             if not isinstance(value, str) or not value.strip():
                 return jsonify(msg=f"❌ '{key}' must be a non-empty string"), 400
             if key == "new_url":
-                new_url = value.strip().upper()
-                # Check for conflict
-                if db.cameras.find_one({"url": new_url}):
-                    return jsonify(msg=f"❌ Camera with URL '{new_url}' already exists"), 409
-                update_data["url"] = new_url
+                update_data["url"] = norm(value)
             elif key == "name":
-                update_data["name"] = value.strip().upper()
+                update_data["name"] = norm(value)
             elif key == "username":
                 update_data["username"] = value.strip()
             elif key == "password":
-                update_data["password"] = bcrypt.hashpw(value.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+                update_data["password"] = value
 
         if not update_data:
-            return jsonify(msg="❌ No valid fields provided to update"), 400
-
-        db.cameras.update_one({"url": normalized_url}, {"$set": update_data})
+            return _error(ERR_NO_FIELDS)
+
+        # Hash only once the camera is known to exist, so a wrong URL never pays for bcrypt
+        if "password" in update_data:
+            if not db.cameras.find_one({"url": normalized_url}, {"_id": 1}):
+                return jsonify(msg=f"❌ Camera with URL '{normalized_url}' not found"), 404
+            update_data["password"] = run_bcrypt(
+                bcrypt.hashpw, update_data["password"].encode('utf-8'), bcrypt.gensalt(rounds=CAMERA_PW_ROUNDS)
+            ).decode('utf-8')
+
+        # Update and fetch in one round trip; the unique url index reports conflicts
+        try:
+            updated_cam = db.cameras.find_one_and_update(
+                {"url": normalized_url},
+                {"$set": update_data},
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return jsonify(msg=f"❌ Camera with URL '{update_data['url']}' already exists"), 409
+        if not updated_cam:
+            return jsonify(msg=f"❌ Camera with URL '{normalized_url}' not found"), 404
 
-        # Sync updated name/url in all stores
+        # Sync updated name/url in all stores in the background; the camera doc is
+        # already correct, so the response doesn't wait on the stores scan
         if "url" in update_data or "name" in update_data:
-            db.stores.update_many(
-                {"cameras.url": normalized_url},
-                {"$set": {
-                    "cameras.$.url": update_data.get("url", normalized_url),
-                    "cameras.$.name": update_data.get("name", camera_doc.get("name", ""))
-                }}
-            )
+            rename_sync_pool.submit(
+                _sync_camera_into_stores, db, stores_fast, updated_cam["_id"]
+            ).add_done_callback(_log_sync_failure)
 
-        updated_cam = db.cameras.find_one({"_id": camera_doc["_id"]})
         updated_cam["_id"] = str(updated_cam["_id"])
         return jsonify(msg="✅ Camera updated", camera=updated_cam)
     
@@ -268,29 +549,32 @@ def init_camera_routes(db):
     @cameras_bp.route("/cameras/add_store", methods=["POST"])
     @jwt_required()
     def add_store_to_camera():
-        data = request.get_json()
-        if not data or not isinstance(data, dict):
-            return jsonify(msg="❌ Body cannot be empty"), 400
+        data, error = _read_json()
+        if error:
+            return error
+        if not data:
+            return _error(ERR_EMPTY_BODY)
 
-        cam_url = data.get("url", "").strip().upper()
-        store_name = data.get("store", "").strip().upper()
+        cam_url = norm(data.get("url"))
+        store_name = norm(data.get("store"))
 
         if not cam_url or not store_name:
-            return jsonify(msg="❌ 'url' and 'store' are required"), 400
-
-        cam = db.cameras.find_one({"url": cam_url})
-        if not cam:
-            return jsonify(msg=f"❌ Camera with URL '{cam_url}' not found"), 404
+            return _error(ERR_URL_STORE_REQUIRED)
 
-        if store_name in cam.get("stores", []):
-            return jsonify(msg=f"ℹ️ Store '{store_name}' already in camera's list. No changes made."), 200
-
-        store_doc = db.stores.find_one({"name": store_name})
-        if not store_doc:
+        if not store_exists(db, store_name):
             return jsonify(msg=f"❌ Store '{store_name}' not found"), 404
 
-        # Update camera
-        db.cameras.update_one({"url": cam_url}, {"$addToSet": {"stores": store_name}})
+        # Add the store only if it isn't listed yet; no match means the camera is
+        # missing or already has the store
+        cam = db.cameras.find_one_and_update(
+            {"url": cam_url, "stores": {"$ne": store_name}},
+            {"$addToSet": {"stores": store_name}},
+            projection={"_id": 1, "url": 1, "name": 1}
+        )
+        if not cam:
+            if not db.cameras.find_one({"url": cam_url}, {"_id": 1}):
+                return jsonify(msg=f"❌ Camera with URL '{cam_url}' not found"), 404
+            return jsonify(msg=f"ℹ️ Store '{store_name}' already in camera's list. No changes made."), 200
 
         # Sync camera ref to store
         db.stores.update_one(
@@ -325,36 +609,39 @@ def init_camera_routes(db):
     @cameras_bp.route("/cameras/remove_store", methods=["POST"])
     @jwt_required()
     def remove_store_from_camera():
-        data = request.get_json()
-        if not data or not isinstance(data, dict):
-            return jsonify(msg="❌ Body cannot be empty"), 400
+        data, error = _read_json()
+        if error:
+            return error
+        if not data:
+            return _error(ERR_EMPTY_BODY)
 
-        url = data.get("url", "").strip().upper()
-        store = data.get("store", "").strip().upper()
+        url = norm(data.get("url"))
+        store = norm(data.get("store"))
 
         if not url or not store:
-            return jsonify(msg="❌ 'url' and 'store' are required"), 400
+            return _error(ERR_URL_STORE_REQUIRED)
 
-        cam = db.cameras.find_one({"url": url})
+        # Only what the membership check and the $pulls need; skips username/password on the wire
+        cam = db.cameras.find_one({"url": url}, {"_id": 1, "stores": 1})
         if not cam:
             return jsonify(msg=f"❌ Camera with URL '{url}' not found"), 404
 
         if store not in cam.get("stores", []):
             return jsonify(msg=f"ℹ️ Store '{store}' not in camera stores list. Nothing to remove."), 200
 
-        store_doc = db.stores.find_one({"name": store})
-        if not store_doc:
+        if not store_exists(db, store):
             return jsonify(msg=f"❌ Store '{store}' not found"), 404
 
+        store_write = sync_pool.submit(
+            db.stores.update_one,
+            {"name": store},
+            {"$pull": {"cameras": {"_id": cam["_id"]}}}
+        )
         db.cameras.update_one(
             {"_id": cam["_id"]},
             {"$pull": {"stores": store}}
         )
-
-        db.stores.update_one(
-            {"name": store},
-            {"$pull": {"cameras": {"_id": cam["_id"]}}}
-        )
+        store_write.result()
 
         return jsonify(msg=f"✅ Store '{store}' removed from camera"), 200
 
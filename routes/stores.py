@@ -1,15 +1,93 @@
 from flask import Blueprint, request, jsonify, Response
 from flask_jwt_extended import jwt_required
-from collections import OrderedDict
-import re
-import json
+from pymongo import UpdateMany, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import orjson
+from validation import is_valid_email, norm
 
 stores_bp = Blueprint("stores", __name__)
 
-# Regex for validating email formats (uppercase-safe)
-email_regex = re.compile(r"^[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}$")
+# Store-name existence checks, also used by the cameras blueprint. Not cached: under
+# several gunicorn workers only the worker that wrote a store could drop its entry, so
+# the others would serve stale answers; the unique stores.name index keeps these cheap.
+def store_exists(db, name):
+    """Returns whether a store called `name` exists (index-only count)."""
+    return db.stores.count_documents({"name": name}, limit=1) > 0
+
+
+def existing_store_names(db, names):
+    """Returns the subset of `names` that are existing stores, with one `$in` query (names only)."""
+    if not names:
+        return set()
+    return {doc["name"] for doc in db.stores.find({"name": {"$in": list(names)}}, {"_id": 0, "name": 1})}
+
+
+# Names and emails are stored uppercased and matched exactly. A case-insensitive
+# collation would only cover the unique indexes: the cross-references in
+# stores.users / users.stores are compared as plain strings by $in/$pull/$addToSet,
+# so they still need one canonical form, and that form is produced here (and by
+# validation.norm).
+def _norm_email(email):
+    """Returns the stored (stripped, uppercased) form of an email, or None if it isn't a non-empty string."""
+    if isinstance(email, str):
+        email = email.strip().upper()
+        if email:
+            return email
+    return None
+
+
+def existing_user_emails(db, emails):
+    """
+    Returns the subset of `emails` that belong to existing users.
+    Filters and projects on `email` only, so the unique users.email index answers it
+    as a covered query without fetching any user documents.
+    """
+    if not emails:
+        return set()
+    return {d["email"] for d in db.users.find({"email": {"$in": emails}}, {"_id": 0, "email": 1})}
+
+
+# update_store: keys that identify/rename the store, and the updatable fields keyed by
+# their lowercased request name (the stored field keeps its canonical casing)
+reserved_keys = frozenset(("name", "current_name", "old_name", "new_name"))
+updatable_fields = {"clientid": "clientID", "address": "address", "cameras": "cameras"}
+
+# Server-side shaping for GET /stores: fixed field order with "" / [] defaults, and
+# camera refs with a stringified `_id` and a fallback `name` for older entries
+# (non-object entries are passed through untouched)
+STORES_LIST_PIPELINE = [
+    {"$project": {
+        "_id": 0,
+        "name": {"$ifNull": ["$name", ""]},
+        "clientID": {"$ifNull": ["$clientID", ""]},
+        "address": {"$ifNull": ["$address", ""]},
+        "users": {"$ifNull": ["$users", []]},
+        "cameras": {"$map": {
+            # update_store can set cameras to a non-array; treat that (and missing) as []
+            "input": {"$cond": [{"$isArray": "$cameras"}, "$cameras", []]},
+            "as": "c",
+            "in": {"$cond": [
+                {"$eq": [{"$type": "$$c"}, "object"]},
+                {"$mergeObjects": [
+                    {"name": ""},
+                    "$$c",
+                    {"_id": {"$cond": [
+                        {"$ifNull": ["$$c._id", False]},
+                        {"$toString": "$$c._id"},
+                        "$$REMOVE"
+                    ]}}
+                ]},
+                "$$c"
+            ]}
+        }}
+    }}
+]
 
 def init_store_routes(db):
+    # Unique store names: turns every name lookup into an index seek and makes the
+    # duplicate checks below a database invariant (no-op if it already exists)
+    db.stores.create_index("name", unique=True)
+
     # -----------------------------------------
     # 🔍 GET /stores — Return all stores
     # -----------------------------------------
@@ -26,30 +104,17 @@ def init_store_routes(db):
     @stores_bp.route("/stores", methods=["GET"])
     @jwt_required()
     def get_stores():
-        stores = []
-        for doc in db.stores.find({}, {"_id": 0}):
-            ordered = OrderedDict()
-            ordered["name"] = doc.get("name", "")
-            ordered["clientID"] = doc.get("clientID", "")
-            ordered["address"] = doc.get("address", "")
-            ordered["users"] = doc.get("users", [])
-
-            converted_cameras = []
-            for cam in doc.get("cameras", []):
-                if isinstance(cam, dict):
-                    cam = cam.copy()
-                    if "_id" in cam:
-                        cam["_id"] = str(cam["_id"])
-                    if "name" not in cam:
-                        cam["name"] = ""  # fallback for older entries
-                    converted_cameras.append(cam)
-                else:
-                    converted_cameras.append(cam)
+        cursor = db.stores.aggregate(STORES_LIST_PIPELINE)
 
-            ordered["cameras"] = converted_cameras
-            stores.append(ordered)
+        # Stream {"stores": [...]} one store at a time as the cursor yields them
+        def stream():
+            sep = b'{"stores":['
+            for doc in cursor:
+                yield sep + orjson.dumps(doc)
+                sep = b","
+            yield b'{"stores":[]}' if sep != b"," else b"]}"
 
-        return Response(json.dumps({"stores": stores}), mimetype="application/json")
+        return Response(stream(), mimetype="application/json")
 
 
 
@@ -98,32 +163,34 @@ def init_store_routes(db):
         if not data or not isinstance(data, dict) or data == {}:
             return jsonify(msg="❌ Body cannot be empty"), 400
 
-        name = data.get("name", "").strip().upper()
+        name = norm(data.get("name"))
         if not name:
             return jsonify(msg="❌ 'name' is required"), 400
-        if db.stores.find_one({"name": name}):
+        if db.stores.count_documents({"name": name}, limit=1):
             return jsonify(msg=f"❌ Store with name '{name}' already exists"), 409
 
-        clientID = data.get("clientID", "").strip().upper()
-        address = data.get("address", "").strip().upper()
+        clientID = norm(data.get("clientID"))
+        address = norm(data.get("address"))
 
         users = data.get("users", [])
         if not isinstance(users, list):
             return jsonify(msg="❌ 'users' must be a list of emails"), 400
 
-        clean_users = []
-        missing_users = []
+        upper_emails = []
         for email in users:
-            if not isinstance(email, str) or not email.strip():
+            upper_email = _norm_email(email)
+            if upper_email is None:
                 continue
-            upper_email = email.strip().upper()
-            if not email_regex.match(upper_email):
+            if not is_valid_email(upper_email):
                 return jsonify(msg=f"❌ Invalid email format: {email}"), 400
-            user_doc = db.users.find_one({"email": upper_email})
-            if user_doc:
-                clean_users.append(upper_email)
-            else:
-                missing_users.append(upper_email)
+            upper_emails.append(upper_email)
+
+        # One query for all existing users instead of one find_one per email
+        # (repeated emails collapsed, order kept, so the store never lists a user twice)
+        upper_emails = list(dict.fromkeys(upper_emails))
+        existing = existing_user_emails(db, upper_emails)
+        clean_users = [e for e in upper_emails if e in existing]
+        missing_users = [e for e in upper_emails if e not in existing]
 
         store = {
             "name": name,
@@ -133,32 +200,35 @@ def init_store_routes(db):
             "cameras": []
         }
 
-        insert_result = db.stores.insert_one(store)
-        new_store = db.stores.find_one({"_id": insert_result.inserted_id}, {"_id": 0})
+        try:
+            db.stores.insert_one(store)
+        except DuplicateKeyError:
+            # Lost a race with another create of the same name
+            return jsonify(msg=f"❌ Store with name '{name}' already exists"), 409
 
         # Sync store to users who exist
-        for user_email in clean_users:
-            db.users.update_one(
-                {"email": user_email},
+        if clean_users:
+            db.users.update_many(
+                {"email": {"$in": clean_users}},
                 {"$addToSet": {"stores": name}}
             )
 
-        ordered_store = OrderedDict()
-        ordered_store["name"] = new_store.get("name", "")
-        ordered_store["clientID"] = new_store.get("clientID", "")
-        ordered_store["address"] = new_store.get("address", "")
-        ordered_store["users"] = new_store.get("users", [])
-        ordered_store["cameras"] = new_store.get("cameras", [])
+        # The inserted document is exactly what we built, so answer from memory
+        ordered_store = {
+            "name": name,
+            "clientID": clientID,
+            "address": address,
+            "users": clean_users,
+            "cameras": []
+        }
 
         msg = "✅ Store created."
         if missing_users:
             msg += f" Non-existing users ignored: {', '.join(missing_users)}. Please create them first in the users endpoint."
 
-        response_data = OrderedDict()
-        response_data["msg"] = msg
-        response_data["store"] = ordered_store
+        response_data = {"msg": msg, "store": ordered_store}
 
-        return Response(json.dumps(response_data), mimetype="application/json"), 201
+        return Response(orjson.dumps(response_data), mimetype="application/json"), 201
 
 
 
@@ -233,7 +303,7 @@ def init_store_routes(db):
         current_name = data.get("name") or data.get("current_name") or data.get("old_name")
         if not current_name or not isinstance(current_name, str):
             return jsonify(msg="❌ 'name' or 'current_name' of the store to update is required"), 400
-        current_name = current_name.strip().upper()
+        current_name = norm(current_name)
 
         existing_store = db.stores.find_one({"name": current_name})
         if not existing_store:
@@ -241,38 +311,33 @@ def init_store_routes(db):
 
         new_name = data.get("new_name")
         if new_name:
-            if not isinstance(new_name, str) or not new_name.strip():
+            new_name = norm(new_name)
+            if not new_name:
                 return jsonify(msg="❌ 'new_name' must be a non-empty string"), 400
-            new_name = new_name.strip().upper()
-            if new_name != current_name and db.stores.find_one({"name": new_name}):
+            if new_name != current_name and db.stores.count_documents({"name": new_name}, limit=1):
                 return jsonify(msg=f"❌ Store with name '{new_name}' already exists"), 409
         else:
             new_name = current_name
 
-        disallowed_fields = {"users"}
-        allowed_keys = set(existing_store.keys()) - {"_id", "users", "name"}
-
         update_fields = {}
         changes_made = False
 
         for key, value in data.items():
             key_lower = key.lower()
-            if key_lower in {"name", "current_name", "old_name", "new_name"}:
+            if key_lower in reserved_keys:
                 continue
-            if key_lower in disallowed_fields:
+            if key_lower == "users":
                 return jsonify(msg=f"❌ Field '{key}' cannot be updated here. Use dedicated endpoints for users."), 400
-            if key_lower not in allowed_keys:
+            field = updatable_fields.get(key_lower)
+            if field is None:
                 return jsonify(msg=f"❌ Field '{key}' is not allowed to be updated"), 400
 
-            if isinstance(value, str):
-                new_val = value.strip().upper()
-            else:
-                new_val = value
+            new_val = norm(value) if isinstance(value, str) else value
 
-            if existing_store.get(key_lower) == new_val:
+            if existing_store.get(field) == new_val:
                 continue
 
-            update_fields[key_lower] = new_val
+            update_fields[field] = new_val
             changes_made = True
 
         if new_name != current_name:
@@ -282,37 +347,48 @@ def init_store_routes(db):
         if not changes_made:
             return jsonify(msg="ℹ️ No changes detected to update"), 200
 
-        db.stores.update_one({"name": current_name}, {"$set": update_fields})
+        # Update and read back the new version in one round trip
+        try:
+            updated_store = db.stores.find_one_and_update(
+                {"name": current_name},
+                {"$set": update_fields},
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return jsonify(msg=f"❌ Store with name '{new_name}' already exists"), 409
+        if updated_store is None:
+            # Deleted between the lookup above and the update
+            return jsonify(msg=f"❌ Store with name '{current_name}' not found"), 404
 
         # If store name changed, update users' store lists
         if new_name != current_name:
             users = existing_store.get("users", [])
-            for user_email in users:
-                # Remove old store name
-                db.users.update_one(
-                    {"email": user_email},
-                    {"$pull": {"stores": current_name}}
-                )
-                # Add new store name (avoid duplicates)
-                db.users.update_one(
-                    {"email": user_email},
-                    {"$addToSet": {"stores": new_name}}
-                )
-
-        updated_store = db.stores.find_one({"name": new_name}, {"_id": 0})
-
-        ordered_store = OrderedDict()
-        ordered_store["name"] = updated_store.get("name", "")
-        ordered_store["clientID"] = updated_store.get("clientID", "")
-        ordered_store["address"] = updated_store.get("address", "")
-        ordered_store["users"] = updated_store.get("users", [])
-        ordered_store["cameras"] = updated_store.get("cameras", [])
+            if users:
+                # Remove old store name, then add the new one (avoid duplicates);
+                # both run in order in a single bulk_write
+                db.users.bulk_write([
+                    UpdateMany({"email": {"$in": users}}, {"$pull": {"stores": current_name}}),
+                    UpdateMany({"email": {"$in": users}}, {"$addToSet": {"stores": new_name}})
+                ], ordered=True)
+
+        # Camera refs carry an ObjectId `_id`; stringify it like GET /stores does
+        cameras = [
+            dict(cam, _id=str(cam["_id"])) if isinstance(cam, dict) and "_id" in cam else cam
+            for cam in updated_store.get("cameras", [])
+        ]
+
+        ordered_store = {
+            "name": updated_store.get("name", ""),
+            "clientID": updated_store.get("clientID", ""),
+            "address": updated_store.get("address", ""),
+            "users": updated_store.get("users", []),
+            "cameras": cameras
+        }
 
-        response_data = OrderedDict()
-        response_data["msg"] = f"✅ Store '{current_name}' updated"
-        response_data["store"] = ordered_store
+        response_data = {"msg": f"✅ Store '{current_name}' updated", "store": ordered_store}
 
-        return Response(json.dumps(response_data), mimetype="application/json"), 200
+        return Response(orjson.dumps(response_data), mimetype="application/json"), 200
 
 
 
@@ -365,24 +441,22 @@ def init_store_routes(db):
 
         # Normalize input to list of uppercase store names
         if isinstance(names, str):
-            store_names = [names.strip().upper()]
+            store_names = [norm(names)]
         elif isinstance(names, list):
-            store_names = [str(n).strip().upper() for n in names if str(n).strip()]
+            store_names = [n for n in map(norm, names) if n]
             if not store_names:
                 return jsonify(msg="❌ 'name' list is empty"), 400
         else:
             return jsonify(msg="❌ 'name' must be a string or list of strings"), 400
 
-        deleted = []
-        not_found = []
+        # One lookup and one delete for the whole list (duplicates collapsed, order kept)
+        store_names = list(dict.fromkeys(store_names))
+        existing = {d["name"] for d in db.stores.find({"name": {"$in": store_names}}, {"_id": 0, "name": 1})}
+        deleted = [n for n in store_names if n in existing]
+        not_found = [n for n in store_names if n not in existing]
 
-        for store_name in store_names:
-            existing = db.stores.find_one({"name": store_name})
-            if existing:
-                db.stores.delete_one({"name": store_name})
-                deleted.append(store_name)
-            else:
-                not_found.append(store_name)
+        if deleted:
+            db.stores.delete_many({"name": {"$in": deleted}})
 
         response_msg = ""
         if deleted:
@@ -441,7 +515,7 @@ def init_store_routes(db):
         if not data or not isinstance(data, dict) or data == {}:
             return jsonify(msg="❌ Body cannot be empty"), 400
 
-        store_name = data.get("store_name", "").strip().upper()
+        store_name = norm(data.get("store_name"))
         user_email = data.get("user_email")
         user_emails = data.get("user_emails")
 
@@ -454,47 +528,40 @@ def init_store_routes(db):
 
         if user_email:
             # Single user, normalize to list
-            if not isinstance(user_email, str) or not user_email.strip():
+            user_email = _norm_email(user_email)
+            if user_email is None:
                 return jsonify(msg="❌ 'user_email' must be a non-empty string"), 400
-            users_to_remove = [user_email.strip().upper()]
+            users_to_remove = [user_email]
         elif user_emails:
             # Multiple users
             if not isinstance(user_emails, list) or not user_emails:
                 return jsonify(msg="❌ 'user_emails' must be a non-empty list of strings"), 400
-            users_to_remove = []
-            for email in user_emails:
-                if isinstance(email, str) and email.strip():
-                    users_to_remove.append(email.strip().upper())
+            users_to_remove = [e for e in map(_norm_email, user_emails) if e]
             if not users_to_remove:
                 return jsonify(msg="❌ 'user_emails' list contains no valid emails"), 400
         else:
             return jsonify(msg="❌ Either 'user_email' or 'user_emails' is required"), 400
 
         # Find store
-        store = db.stores.find_one({"name": store_name})
+        store = db.stores.find_one({"name": store_name}, {"_id": 0, "users": 1})
         if not store:
             return jsonify(msg=f"❌ Store '{store_name}' not found"), 404
 
-        removed_users = []
-        not_found_users = []
-        not_in_store = []
+        # Classify every email with one users query and the store's own list
+        users_to_remove = list(dict.fromkeys(users_to_remove))
+        existing = existing_user_emails(db, users_to_remove)
+        store_users = set(store.get("users", []))
 
-        for user_email in users_to_remove:
-            user = db.users.find_one({"email": user_email})
-            if not user:
-                not_found_users.append(user_email)
-                continue
-            if user_email not in store.get("users", []):
-                not_in_store.append(user_email)
-                continue
+        not_found_users = [e for e in users_to_remove if e not in existing]
+        not_in_store = [e for e in users_to_remove if e in existing and e not in store_users]
+        removed_users = [e for e in users_to_remove if e in existing and e in store_users]
 
-            # Remove user from store's users list
-            db.stores.update_one({"name": store_name}, {"$pull": {"users": user_email}})
-
-            # Remove store from user's stores list
-            db.users.update_one({"email": user_email}, {"$pull": {"stores": store_name}})
+        if removed_users:
+            # Remove users from store's users list
+            db.stores.update_one({"name": store_name}, {"$pull": {"users": {"$in": removed_users}}})
 
-            removed_users.append(user_email)
+            # Remove store from those users' stores lists
+            db.users.update_many({"email": {"$in": removed_users}}, {"$pull": {"stores": store_name}})
 
         msg_parts = []
         if removed_users:
@@ -563,7 +630,7 @@ def init_store_routes(db):
         if not data or not isinstance(data, dict) or data == {}:
             return jsonify(msg="❌ Body cannot be empty"), 400
 
-        store_name = data.get("store_name", "").strip().upper()
+        store_name = norm(data.get("store_name"))
         user_emails = data.get("user_email") or data.get("user_emails")
 
         if not store_name:
@@ -571,42 +638,35 @@ def init_store_routes(db):
         if not user_emails:
             return jsonify(msg="❌ 'user_email' or 'user_emails' is required"), 400
 
-        # Normalize to list
+        # Normalize to list, each email normalized once
         if isinstance(user_emails, str):
-            user_emails = [user_emails.strip().upper()]
-        elif isinstance(user_emails, list):
-            user_emails = [str(email).strip().upper() for email in user_emails if str(email).strip()]
-        else:
+            user_emails = [user_emails]
+        elif not isinstance(user_emails, list):
             return jsonify(msg="❌ 'user_email' must be a string or list of strings"), 400
+        user_emails = [e for e in map(_norm_email, user_emails) if e]
+        if not user_emails:
+            return jsonify(msg="❌ 'user_email' or 'user_emails' is required"), 400
 
         # Find store
-        store = db.stores.find_one({"name": store_name})
+        store = db.stores.find_one({"name": store_name}, {"_id": 0, "users": 1})
         if not store:
             return jsonify(msg=f"❌ Store '{store_name}' not found"), 404
 
-        already_in_store = []
-        missing_users = []
-        added_users = []
-        not_in_store = []
+        # Split against the store's current list, then resolve the rest in one users query
+        user_emails = list(dict.fromkeys(user_emails))
+        current_users = set(store.get("users", []))
+        already_in_store = [e for e in user_emails if e in current_users]
+        candidates = [e for e in user_emails if e not in current_users]
 
-        current_users = store.get("users", [])
-
-        for email in user_emails:
-            if email in current_users:
-                already_in_store.append(email)
-                continue
+        existing = existing_user_emails(db, candidates)
+        added_users = [e for e in candidates if e in existing]
+        missing_users = [e for e in candidates if e not in existing]
 
-            user = db.users.find_one({"email": email})
-            if not user:
-                missing_users.append(email)
-                continue
-
-            # Add user to store's users list
-            db.stores.update_one({"name": store_name}, {"$addToSet": {"users": email}})
-            # Add store to user's stores list
-            db.users.update_one({"email": email}, {"$addToSet": {"stores": store_name}})
-
-            added_users.append(email)
+        if added_users:
+            # Add users to store's users list
+            db.stores.update_one({"name": store_name}, {"$addToSet": {"users": {"$each": added_users}}})
+            # Add store to those users' stores lists
+            db.users.update_many({"email": {"$in": added_users}}, {"$addToSet": {"stores": store_name}})
 
         msg_parts = []
         if added_users:
@@ -1,22 +1,46 @@
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from collections import OrderedDict
+from cachetools import TTLCache
+import threading
 import re
-import json
 import bcrypt
+from hashing import run_bcrypt
+from validation import is_valid_email
 
 super_user_bp = Blueprint('super_user', __name__)
 
-# Email regex (uppercase-safe)
-email_regex = re.compile(
-    r"^[A-Z0-9._%+\-äöüßÄÖÜ]+@[A-Z0-9.\-äöüßÄÖÜ]+\.[A-Z]{2,}$",
-    re.IGNORECASE
-)
-
 # Password regex: min 8 chars, at least 1 uppercase and 1 digit
 password_regex = re.compile(r"^(?=.*[A-Z])(?=.*\d).{8,}$")
 
+# Fixed cost for new user password hashes (bcrypt's own default)
+USER_PW_ROUNDS = 12
+
+# The super password hash changes rarely, so keep it in memory instead of hitting Mongo per reset
+super_hash_cache = TTLCache(maxsize=1, ttl=300)
+super_hash_lock = threading.Lock()
+
+
+def load_super_password_hash(db):
+    """
+    Returns the bcrypt hash stored as SUPER_PASSWORD in the env collection, cached for 5 minutes.
+    A missing value comes back as None and is not cached.
+    """
+    with super_hash_lock:
+        pw_hash = super_hash_cache.get("super")
+    if pw_hash is None:
+        env_doc = db.env.find_one({"key": "SUPER_PASSWORD"}, {"_id": 0, "value": 1})
+        pw_hash = (env_doc or {}).get("value")
+        if pw_hash:
+            with super_hash_lock:
+                super_hash_cache["super"] = pw_hash
+    return pw_hash
+
 def init_super_user_routes(db):
+    # Indexes for the user and env lookups in reset_user_password (no-op if they exist)
+    db.users.create_index("email", unique=True)
+    db.env.create_index("key", unique=True)
+    load_super_password_hash(db)
+
     """
     🔐 PUT /super_user/reset_password — Hard reset user password with super password
 
@@ -70,7 +94,7 @@ def init_super_user_routes(db):
         if not email:
             return jsonify(msg="❌ 'email' is required"), 400
         email_upper = email.upper()
-        if not email_regex.match(email):
+        if not is_valid_email(email):
             return jsonify(msg="❌ Invalid email format"), 400
 
         new_password = data.get("new_password", "").strip()
@@ -81,28 +105,28 @@ def init_super_user_routes(db):
         if force is not True:
             return jsonify(msg="❌ 'force' must be true to confirm reset"), 400
 
-        # Get hashed super_password from env collection
-        env_doc = db.env.find_one({"key": "SUPER_PASSWORD"})
-        if not env_doc or "value" not in env_doc:
-            return jsonify(msg="❌ Super password not configured"), 500
-
-        hashed_super_password = env_doc["value"]
-
-        # Verify super_password
-        if not bcrypt.checkpw(super_password_plain.encode(), hashed_super_password.encode()):
-            return jsonify(msg="❌ Invalid super_password"), 403
+        # Cheap checks first so bad requests never pay for a bcrypt verify
+        # Validate new_password complexity
+        if not password_regex.match(new_password):
+            return jsonify(msg="❌ Password must be at least 8 chars, with 1 uppercase and 1 number"), 400
 
         # Check user existence
-        user = db.users.find_one({"email": email_upper})
-        if not user:
+        if not db.users.find_one({"email": email_upper}, {"_id": 1}):
             return jsonify(msg=f"❌ User with email '{email_upper}' not found"), 404
 
-        # Validate new_password complexity
-        if not password_regex.match(new_password):
-            return jsonify(msg="❌ Password must be at least 8 chars, with 1 uppercase and 1 number"), 400
+        # Get hashed super_password from env collection (cached)
+        hashed_super_password = load_super_password_hash(db)
+        if not hashed_super_password:
+            return jsonify(msg="❌ Super password not configured"), 500
+
+        # Verify super_password
+        if not run_bcrypt(bcrypt.checkpw, super_password_plain.encode(), hashed_super_password.encode()):
+            return jsonify(msg="❌ Invalid super_password"), 403
 
         # Hash new password and update user
-        hashed_new_pw = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
+        hashed_new_pw = run_bcrypt(
+            bcrypt.hashpw, new_password.encode(), bcrypt.gensalt(rounds=USER_PW_ROUNDS)
+        ).decode()
 
         db.users.update_one({"email": email_upper}, {"$set": {"password": hashed_new_pw}})
 
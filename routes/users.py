@@ -1,372 +1,483 @@
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, Response, current_app
 from flask_jwt_extended import jwt_required
-from collections import OrderedDict
-import re
-import json
+from pymongo import ReturnDocument
+from pymongo.write_concern import WriteConcern
+from pymongo.errors import DuplicateKeyError
+import hmac
+import string
+import bcrypt
+import orjson
+from hashing import run_bcrypt
+from validation import is_valid_email, norm
 
 users_bp = Blueprint("users", __name__)
 
-# Email regex uppercase-safe + German letters äöüßÄÖÜ allowed in local part and domain
-email_regex = re.compile(
-    r"^[A-Z0-9._%+\-äöüßÄÖÜ]+@[A-Z0-9.\-äöüßÄÖÜ]+\.[A-Z]{2,}$",
-    re.IGNORECASE
+# Password rules: min 8 chars, at least 1 uppercase (A-Z) and 1 digit, checked with
+# C-level set scans. Non-ASCII digits still count (as with the old \d), but are only
+# looked for when no ASCII digit is present
+password_upper_chars = frozenset(string.ascii_uppercase)
+password_digit_chars = frozenset(string.digits)
+
+
+def is_valid_password(password):
+    return (
+        len(password) >= 8
+        and not password_upper_chars.isdisjoint(password)
+        and (not password_digit_chars.isdisjoint(password) or any(map(str.isdecimal, password)))
+    )
+
+# User password hashing: fixed bcrypt cost (the same as super_user's password reset)
+USER_PW_ROUNDS = 12
+
+# Acknowledged but unjournaled writes for store-side sync after user deletes
+stores_sync_concern = WriteConcern(w=1, j=False)
+
+
+def hash_password(password):
+    """Returns the bcrypt hash of `password` as a string."""
+    return run_bcrypt(bcrypt.hashpw, password.encode(), bcrypt.gensalt(rounds=USER_PW_ROUNDS)).decode()
+
+
+def check_password(password, stored):
+    """
+    Checks `password` against a stored bcrypt hash in constant time.
+    Users created before passwords were hashed still hold plaintext; those are
+    compared with hmac.compare_digest until the password is next changed.
+    """
+    if not isinstance(password, str) or not isinstance(stored, str):
+        return False
+    if stored.startswith("$2"):
+        return run_bcrypt(bcrypt.checkpw, password.encode(), stored.encode())
+    return hmac.compare_digest(password.encode(), stored.encode())
+
+# Public user fields in response order, with the default for documents missing one
+user_fields = (
+    ("email", ""),
+    ("clientID", ""),
+    ("name", ""),
+    ("tel", ""),
+    ("address", ""),
+    ("stores", []),
 )
 
-# Password regex: min 8 chars, at least 1 uppercase and 1 digit
-password_regex = re.compile(r"^(?=.*[A-Z])(?=.*\d).{8,}$")
 
-def init_user_routes(db):
+def _user_view(doc):
+    """Returns the public, fixed-order view of a user document (never includes the password)."""
+    return {key: doc.get(key, default) for key, default in user_fields}
+
+
+def _json_response(obj, status=200):
+    """Encodes `obj` with orjson straight into a JSON response."""
+    return Response(orjson.dumps(obj), mimetype="application/json", status=status)
+
+
+def validate_user_payload(data):
+    """
+    Validates and normalizes a create_user body in one pass.
+    Returns (error_msg, None) on failure or (None, fields) with the user fields (the
+    password still in plain text).
     """
-    ➕ POST /users — Create new user
+    email = data.get("email")
+    email = email.strip() if isinstance(email, str) else ""
+    password = data.get("password")
+    password = password if isinstance(password, str) else ""
+
+    if not email:
+        return "❌ 'email' is required", None
+    if not password:
+        return "❌ 'password' is required", None
+    if not is_valid_email(email):
+        return "❌ Invalid email format", None
+    if not is_valid_password(password):
+        return "❌ Password must be at least 8 chars, with 1 uppercase and 1 number", None
+
+    # Email is stored uppercased for lookups; optional fields are uppercased too
+    return None, {
+        "email": email.upper(),
+        "password": password,
+        "clientID": norm(data.get("clientID")),
+        "name": norm(data.get("name")),
+        "tel": norm(data.get("tel")),
+        "address": norm(data.get("address")),
+    }
 
-    ✅ Requires:
-        - Access token
-        - JSON body with required: email, password
-        - Optional: clientID, name, tel, address (default empty strings)
 
-    ❌ Errors:
-        - Missing required fields
-        - Invalid email or password format
-        - User with email already exists
+# Key of the unique users.email index; email lookups hint it so they always use the index
+email_index = [("email", 1)]
 
-    🔐 Example:
-    {
-        "email": "user@example.com",
-        "password": "Pass1234",
+
+# update_user key handling, by lowercased request key: keys that only identify the user
+# or feed another key's handler, keys that may not be changed here, and stored field
+# names that differ from the lowercased key
+update_skip_keys = frozenset(("email", "old_password"))
+update_disallowed_keys = frozenset(("stores",))
+update_field_names = {"clientid": "clientID"}
+
+
+def _update_password(db, existing_user, value, old_pass):
+    """Returns ({field: value} to set, None), or (None, (message, status)) if rejected."""
+    if not old_pass:
+        return None, ("❌ 'old_password' is required to update password", 400)
+    # Cheap check first so a weak new password never pays for a bcrypt verify
+    if not is_valid_password(value):
+        return None, ("❌ Password must be at least 8 chars, with 1 uppercase and 1 number", 400)
+    if not check_password(old_pass, existing_user.get("password")):
+        return None, ("❌ 'old_password' does not match", 400)
+    return {"password": hash_password(value)}, None
+
+
+def _update_new_email(db, existing_user, value, old_pass):
+    """Returns ({field: value} to set, None), or (None, (message, status)) if rejected."""
+    new_email = value.strip()
+    if not is_valid_email(new_email):
+        return None, ("❌ Invalid new email format", 400)
+    new_email_upper = new_email.upper()
+    if new_email_upper == existing_user.get("email"):
+        return {}, None
+    if db.users.count_documents({"email": new_email_upper}, limit=1, hint=email_index):
+        return None, (f"❌ User with email '{new_email_upper}' already exists", 409)
+    return {"email": new_email_upper}, None
+
+
+# Keys that need more than a normalize-and-compare
+update_handlers = {
+    "password": _update_password,
+    "new_email": _update_new_email,
+}
+
+
+def init_user_routes(db):
+    """
+    Prepares the users collection for the routes below. The routes themselves read the
+    database from current_app.config["DB"], so the blueprint holds no per-app state.
+    """
+    # Indexes for the lookups below (create_index is a no-op if they already exist):
+    # unique emails for every user lookup, and the store membership used by the
+    # email rename and delete syncs
+    db.users.create_index(email_index, unique=True)
+    db.stores.create_index("users")
+
+
+"""
+➕ POST /users — Create new user
+
+✅ Requires:
+    - Access token
+    - JSON body with required: email, password
+    - Optional: clientID, name, tel, address (default empty strings)
+
+❌ Errors:
+    - Missing required fields
+    - Invalid email or password format
+    - User with email already exists
+
+🔐 Example:
+{
+    "email": "user@example.com",
+    "password": "Pass1234",
+    "clientID": "CLIENT1",
+    "name": "John Doe",
+    "tel": "123456",
+    "address": "Zurich"
+}
+
+✅ Success response:
+{
+    "msg": "✅ User created",
+    "user": {
+        "email": "USER@EXAMPLE.COM",
         "clientID": "CLIENT1",
-        "name": "John Doe",
+        "name": "JOHN DOE",
         "tel": "123456",
-        "address": "Zurich"
+        "address": "ZURICH",
+        "stores": []
+    }
+}
+"""
+
+@users_bp.route("/users", methods=["POST"])
+@jwt_required()
+def create_user():
+    db = current_app.config["DB"]
+    data = request.get_json()
+    if not data or not isinstance(data, dict) or data == {}:
+        return _json_response({"msg": "❌ Body cannot be empty"}, 400)
+
+    error, fields = validate_user_payload(data)
+    if error:
+        return _json_response({"msg": error}, 400)
+    email_upper = fields["email"]
+    exists_msg = {"msg": f"❌ User with email '{email_upper}' already exists"}
+
+    # Indexed existence check first, so a duplicate email never pays for a bcrypt hash
+    if db.users.count_documents({"email": email_upper}, limit=1, hint=email_index):
+        return _json_response(exists_msg, 409)
+
+    user_doc = {
+        "email": email_upper,
+        "password": hash_password(fields["password"]),
+        "clientID": fields["clientID"],
+        "name": fields["name"],
+        "tel": fields["tel"],
+        "address": fields["address"],
+        "stores": []
     }
 
-    ✅ Success response:
+    # Insert only if no user has this email, so a create racing this one since the
+    # check above still gets a 409 instead of overwriting it
+    new_fields = {key: value for key, value in user_doc.items() if key != "email"}
+    try:
+        result = db.users.update_one({"email": email_upper}, {"$setOnInsert": new_fields}, upsert=True)
+    except DuplicateKeyError:
+        # Lost a race with another create of the same email
+        return _json_response(exists_msg, 409)
+    if result.upserted_id is None:
+        return _json_response(exists_msg, 409)
+
+    response_data = {"msg": "✅ User created", "user": _user_view(user_doc)}
+
+    return _json_response(response_data, 201)
+
+@users_bp.route("/users", methods=["GET"])
+@jwt_required()
+def get_users():
+    db = current_app.config["DB"]
+    cursor = db.users.find({}, {"_id": 0, "password": 0}).batch_size(1000)
+
+    # Stream {"users": [...]} one user at a time as the cursor yields them
+    def stream():
+        sep = b'{"users":['
+        for doc in cursor:
+            yield sep + orjson.dumps(_user_view(doc))
+            sep = b","
+        yield b'{"users":[]}' if sep != b"," else b"]}"
+
+    return Response(stream(), mimetype="application/json")
+
+"""
+🔄 PUT /users — Update existing user
+
+- Requires JWT access token
+- Request body must be JSON with:
+    - "email" (string, required): current user email to identify the user (case-insensitive)
+    - Optional fields to update (strings will be uppercased):
+        - "clientID", "name", "tel", "address"
+        - "password" (requires "old_password" to verify current password)
+        - "new_email" (must be valid email format and unique)
+
+- Restrictions:
+    - "stores" field cannot be updated here
+    - Password update requires correct old_password
+    - Email update requires unique and valid new_email
+
+- Additional behavior:
+    - If "new_email" is changed, all stores where the old email exists in the "users" list will be updated to replace old email with new email, syncing user-store relationships.
+    - (If user names are stored in stores, name sync logic can be added similarly.)
+
+- Example request to update name and address:
     {
-        "msg": "✅ User created",
-        "user": {
-            "email": "USER@EXAMPLE.COM",
-            "clientID": "CLIENT1",
-            "name": "JOHN DOE",
-            "tel": "123456",
-            "address": "ZURICH",
-            "stores": []
-        }
+        "email": "USER@EXAMPLE.COM",
+        "name": "John Smith",
+        "address": "New York"
     }
-    """
-    @users_bp.route("/users", methods=["POST"])
-    @jwt_required()
-    def create_user():
-        data = request.get_json()
-        if not data or not isinstance(data, dict) or data == {}:
-            return jsonify(msg="❌ Body cannot be empty"), 400
-
-        # Required fields
-        email = data.get("email", "").strip()
-        password = data.get("password", "")
-
-        if not email:
-            return jsonify(msg="❌ 'email' is required"), 400
-        if not password:
-            return jsonify(msg="❌ 'password' is required"), 400
-
-        # Validate email format
-        if not email_regex.match(email):
-            return jsonify(msg="❌ Invalid email format"), 400
-
-        # Validate password format
-        if not password_regex.match(password):
-            return jsonify(msg="❌ Password must be at least 8 chars, with 1 uppercase and 1 number"), 400
-
-        # Normalize email to uppercase for storage and lookup
-        email_upper = email.upper()
-
-        # Check for existing user
-        if db.users.find_one({"email": email_upper}):
-            return jsonify(msg=f"❌ User with email '{email_upper}' already exists"), 409
-
-        # Optional fields (uppercase except password)
-        clientID = data.get("clientID", "").strip().upper()
-        name = data.get("name", "").strip().upper()
-        tel = data.get("tel", "").strip().upper()
-        address = data.get("address", "").strip().upper()
-
-        user_doc = {
-            "email": email_upper,
-            "password": password,  # Store as is (consider hashing in production)
-            "clientID": clientID,
-            "name": name,
-            "tel": tel,
-            "address": address,
-            "stores": []
-        }
-
-        db.users.insert_one(user_doc)
-
-        ordered_user = OrderedDict()
-        ordered_user["email"] = user_doc["email"]
-        ordered_user["clientID"] = user_doc["clientID"]
-        ordered_user["name"] = user_doc["name"]
-        ordered_user["tel"] = user_doc["tel"]
-        ordered_user["address"] = user_doc["address"]
-        ordered_user["stores"] = user_doc["stores"]
-
-        response_data = OrderedDict()
-        response_data["msg"] = "✅ User created"
-        response_data["user"] = ordered_user
-
-        return Response(json.dumps(response_data), mimetype="application/json"), 201
-
-    @users_bp.route("/users", methods=["GET"])
-    @jwt_required()
-    def get_users():
-        users = []
-        for doc in db.users.find({}, {"_id": 0, "password": 0}):
-            ordered = OrderedDict()
-            ordered["email"] = doc.get("email", "")
-            ordered["clientID"] = doc.get("clientID", "")
-            ordered["name"] = doc.get("name", "")
-            ordered["tel"] = doc.get("tel", "")
-            ordered["address"] = doc.get("address", "")
-            ordered["stores"] = doc.get("stores", [])
-            users.append(ordered)
-        response_data = {"users": users}
-        return Response(json.dumps(response_data), mimetype="application/json")
-        
-    """
-    🔄 PUT /users — Update existing user
-
-    - Requires JWT access token
-    - Request body must be JSON with:
-        - "email" (string, required): current user email to identify the user (case-insensitive)
-        - Optional fields to update (strings will be uppercased):
-            - "clientID", "name", "tel", "address"
-            - "password" (requires "old_password" to verify current password)
-            - "new_email" (must be valid email format and unique)
-
-    - Restrictions:
-        - "stores" field cannot be updated here
-        - Password update requires correct old_password
-        - Email update requires unique and valid new_email
-
-    - Additional behavior:
-        - If "new_email" is changed, all stores where the old email exists in the "users" list will be updated to replace old email with new email, syncing user-store relationships.
-        - (If user names are stored in stores, name sync logic can be added similarly.)
-
-    - Example request to update name and address:
-        {
-            "email": "USER@EXAMPLE.COM",
-            "name": "John Smith",
-            "address": "New York"
-        }
-
-    - Example request to change password:
-        {
-            "email": "USER@EXAMPLE.COM",
-            "password": "NewPass123",
-            "old_password": "OldPass123"
-        }
-
-    - Example request to change email:
-        {
-            "email": "USER@EXAMPLE.COM",
-            "new_email": "NEWUSER@EXAMPLE.COM"
-        }
-
-    - Success responses include updated user data with keys in fixed order.
-
-    - Possible errors:
-        - Missing "email"
-        - User not found
-        - Attempt to update disallowed fields ("stores")
-        - Password update without old_password or incorrect old_password
-        - Invalid new_email format or duplicate email
-        - Password complexity rules violation
-        - No valid update fields provided
-    """
 
-    
-    @users_bp.route("/users", methods=["PUT"])
-    @jwt_required()
-    def update_user():
-        data = request.get_json()
-        if not data or not isinstance(data, dict) or data == {}:
-            return jsonify(msg="❌ Body cannot be empty"), 400
-
-        email = data.get("email", "").strip()
-        if not email:
-            return jsonify(msg="❌ 'email' is required to identify the user"), 400
-        email_upper = email.upper()
-
-        existing_user = db.users.find_one({"email": email_upper})
-        if not existing_user:
-            return jsonify(msg=f"❌ User with email '{email_upper}' not found"), 404
-
-        disallowed_fields = {"stores"}
-        update_fields = {}
-        password_update = False
-        changes_made = False
-
-        new_email_upper = None
-        new_name_upper = None
-
-        for key, value in data.items():
-            key_lower = key.lower()
-            if key_lower == "email":
-                continue
-            if key_lower in disallowed_fields:
-                return jsonify(msg=f"❌ Field '{key}' cannot be updated here."), 400
-
-            if key_lower == "password":
-                old_pass = data.get("old_password")
-                if not old_pass:
-                    return jsonify(msg="❌ 'old_password' is required to update password"), 400
-                if old_pass != existing_user.get("password"):
-                    return jsonify(msg="❌ 'old_password' does not match"), 400
-                if not password_regex.match(value):
-                    return jsonify(msg="❌ Password must be at least 8 chars, with 1 uppercase and 1 number"), 400
-                update_fields["password"] = value
-                password_update = True
-                changes_made = True
-                continue
-
-            if key_lower == "new_email":
-                new_email = value.strip()
-                if not email_regex.match(new_email):
-                    return jsonify(msg="❌ Invalid new email format"), 400
-                new_email_upper = new_email.upper()
-                if new_email_upper != email_upper and db.users.find_one({"email": new_email_upper}):
-                    return jsonify(msg=f"❌ User with email '{new_email_upper}' already exists"), 409
-                if existing_user.get("email") != new_email_upper:
-                    update_fields["email"] = new_email_upper
-                    changes_made = True
-                continue
-
-            if key_lower == "name":
-                new_name_upper = value.strip().upper()
-                if existing_user.get("name") != new_name_upper:
-                    update_fields["name"] = new_name_upper
-                    changes_made = True
-                continue
-
-            # For other fields, uppercase strings except password handled above
-            new_val = value.strip().upper() if isinstance(value, str) else value
-            if existing_user.get(key_lower) != new_val:
-                update_fields[key_lower] = new_val
-                changes_made = True
-
-        if not changes_made:
-            return jsonify(msg="ℹ️ No changes detected"), 200
-
-        # Update user document
-        db.users.update_one({"email": email_upper}, {"$set": update_fields})
-
-        # If email changed, update it in all stores' users lists
-        if new_email_upper and new_email_upper != email_upper:
-            db.stores.update_many(
-                {"users": email_upper},
-                {"$set": {"users.$": new_email_upper}}
-            )
-
-        # If name changed, sync user name in stores if stored there (if applicable)
-        # (Assuming stores only keep user emails, not names, so skip)
-        # If you keep names in stores, add sync code here
-
-        updated_user = db.users.find_one({"email": update_fields.get("email", email_upper)}, {"_id": 0, "password": 0})
-
-        ordered_user = OrderedDict()
-        ordered_user["email"] = updated_user.get("email", "")
-        ordered_user["clientID"] = updated_user.get("clientID", "")
-        ordered_user["name"] = updated_user.get("name", "")
-        ordered_user["tel"] = updated_user.get("tel", "")
-        ordered_user["address"] = updated_user.get("address", "")
-        ordered_user["stores"] = updated_user.get("stores", [])
-
-        msg = "✅ User updated"
-        if password_update:
-            msg += " (password changed)"
-
-        return Response(json.dumps({"msg": msg, "user": ordered_user}), mimetype="application/json"), 200
-    
-    """
-    🔴 DELETE /users — Delete one or more users and sync removal from all stores
-
-    ✅ Requires:
-        - Access token
-        - JSON body with:
-            - "emails": list of user email strings to delete (case-insensitive)
-            - "force": true (confirmation flag)
-
-    ❌ Errors:
-        - Missing or empty "emails" list
-        - "force" not true
-        - Any user email not found (reported in response, but deletion proceeds for others)
-
-    🧪 Example request body (single user):
-        {
-            "emails": ["USER@EXAMPLE.COM"],
-            "force": true
-        }
-
-    🧪 Example request body (multiple users):
-        {
-            "emails": ["USER1@EXAMPLE.COM", "USER2@EXAMPLE.COM"],
-            "force": true
-        }
-
-    🔐 Example curl (replace <TOKEN>):
-        curl -k -X DELETE https://your-url/users \
-        -H "Authorization: Bearer <TOKEN>" \
-        -H "Content-Type: application/json" \
-        -d '{"emails": ["USER@EXAMPLE.COM", "OTHER@EXAMPLE.COM"], "force": true}'
-
-    ✅ Success response:
-        {
-            "msg": "✅ Deleted users: USER@EXAMPLE.COM, OTHER@EXAMPLE.COM. ❌ Not found: MISSING@EXAMPLE.COM"
-        }
-    """
+- Example request to change password:
+    {
+        "email": "USER@EXAMPLE.COM",
+        "password": "NewPass123",
+        "old_password": "OldPass123"
+    }
 
-    @users_bp.route("/users", methods=["DELETE"])
-    @jwt_required()
-    def delete_users():
-        data = request.get_json()
-        if not data or not isinstance(data, dict) or data == {}:
-            return jsonify(msg="❌ Body cannot be empty"), 400
-
-        emails = data.get("emails")
-        force = data.get("force", False)
-
-        if not emails or not isinstance(emails, list):
-            return jsonify(msg="❌ 'emails' must be a non-empty list of email strings"), 400
-        if force is not True:
-            return jsonify(msg="❌ You must confirm deletion with 'force': true"), 400
-
-        normalized_emails = [email.strip().upper() for email in emails if isinstance(email, str) and email.strip()]
-        if not normalized_emails:
-            return jsonify(msg="❌ 'emails' list is empty or invalid"), 400
-
-        deleted = []
-        not_found = []
-
-        for email in normalized_emails:
-            user = db.users.find_one({"email": email})
-            if not user:
-                not_found.append(email)
-                continue
-
-            # Remove user from all stores
-            db.stores.update_many(
-                {"users": email},
-                {"$pull": {"users": email}}
-            )
-
-            # Delete user
-            db.users.delete_one({"email": email})
-            deleted.append(email)
-
-        msg_parts = []
-        if deleted:
-            msg_parts.append(f"✅ Deleted users: {', '.join(deleted)}")
-        if not_found:
-            msg_parts.append(f"❌ Not found: {', '.join(not_found)}")
-
-        return jsonify(msg=". ".join(msg_parts)), 200
+- Example request to change email:
+    {
+        "email": "USER@EXAMPLE.COM",
+        "new_email": "NEWUSER@EXAMPLE.COM"
+    }
+
+- Success responses include updated user data with keys in fixed order.
+
+- Possible errors:
+    - Missing "email"
+    - User not found
+    - Attempt to update disallowed fields ("stores")
+    - Password update without old_password or incorrect old_password
+    - Invalid new_email format or duplicate email
+    - Password complexity rules violation
+    - No valid update fields provided
+"""
+
+
+@users_bp.route("/users", methods=["PUT"])
+@jwt_required()
+def update_user():
+    db = current_app.config["DB"]
+    data = request.get_json()
+    if not data or not isinstance(data, dict) or data == {}:
+        return _json_response({"msg": "❌ Body cannot be empty"}, 400)
+
+    email = data.get("email", "").strip()
+    if not email:
+        return _json_response({"msg": "❌ 'email' is required to identify the user"}, 400)
+    email_upper = email.upper()
+
+    # Read old_password and lowercase every key once, up front
+    old_password = data.get("old_password")
+    lowered = {key.lower(): (key, value) for key, value in data.items()}
+
+    # Reject disallowed fields before any database work
+    disallowed = update_disallowed_keys.intersection(lowered)
+    if disallowed:
+        names = ", ".join(f"'{lowered[key][0]}'" for key in sorted(disallowed))
+        return _json_response({"msg": f"❌ Field {names} cannot be updated here."}, 400)
+
+    # Everything but the stores list, which can be long and isn't updatable here
+    existing_user = db.users.find_one({"email": email_upper}, {"_id": 0, "stores": 0}, hint=email_index)
+    if not existing_user:
+        return _json_response({"msg": f"❌ User with email '{email_upper}' not found"}, 404)
+
+    update_fields = {}
+
+    for key_lower, (_, value) in lowered.items():
+        if key_lower in update_skip_keys:
+            continue
+
+        handler = update_handlers.get(key_lower)
+        if handler is not None:
+            fields, error = handler(db, existing_user, value, old_password)
+            if error:
+                return _json_response({"msg": error[0]}, error[1])
+            update_fields.update(fields)
+            continue
+
+        # Other fields: strings are stored uppercased
+        field = update_field_names.get(key_lower, key_lower)
+        new_val = norm(value) if isinstance(value, str) else value
+        if existing_user.get(field) != new_val:
+            update_fields[field] = new_val
+
+    if not update_fields:
+        return _json_response({"msg": "ℹ️ No changes detected"})
+
+    # Update and read back the new version in one round trip; the unique email index
+    # reports a new_email taken since the check above
+    try:
+        updated_user = db.users.find_one_and_update(
+            {"email": email_upper},
+            {"$set": update_fields},
+            projection={"_id": 0, "password": 0},
+            return_document=ReturnDocument.AFTER,
+            hint=email_index
+        )
+    except DuplicateKeyError:
+        return _json_response({"msg": f"❌ User with email '{update_fields['email']}' already exists"}, 409)
+    if not updated_user:
+        return _json_response({"msg": f"❌ User with email '{email_upper}' not found"}, 404)
+
+    # Only once the user holds the new email, rename it in every store's users list
+    # (all occurrences, not just the first)
+    new_email_upper = update_fields.get("email")
+    if new_email_upper:
+        db.stores.update_many(
+            {"users": email_upper},
+            {"$set": {"users.$[u]": new_email_upper}},
+            array_filters=[{"u": email_upper}]
+        )
+
+    # If name changed, sync user name in stores if stored there (if applicable)
+    # (Assuming stores only keep user emails, not names, so skip)
+    # If you keep names in stores, add sync code here
+
+    msg = "✅ User updated"
+    if "password" in update_fields:
+        msg += " (password changed)"
+
+    return _json_response({"msg": msg, "user": _user_view(updated_user)})
+
+"""
+🔴 DELETE /users — Delete one or more users and sync removal from all stores
+
+✅ Requires:
+    - Access token
+    - JSON body with:
+        - "emails": list of user email strings to delete (case-insensitive)
+        - "force": true (confirmation flag)
+
+❌ Errors:
+    - Missing or empty "emails" list
+    - "force" not true
+    - Any user email not found (reported in response, but deletion proceeds for others)
+
+🧪 Example request body (single user):
+    {
+        "emails": ["USER@EXAMPLE.COM"],
+        "force": true
+    }
+
+🧪 Example request body (multiple users):
+    {
+        "emails": ["USER1@EXAMPLE.COM", "USER2@EXAMPLE.COM"],
+        "force": true
+    }
+
+🔐 Example curl (replace <TOKEN>):
+    curl -k -X DELETE https://your-url/users \
+    -H "Authorization: Bearer <TOKEN>" \
+    -H "Content-Type: application/json" \
+    -d '{"emails": ["USER@EXAMPLE.COM", "OTHER@EXAMPLE.COM"], "force": true}'
+
+✅ Success response:
+    {
+        "msg": "✅ Deleted users: USER@EXAMPLE.COM, OTHER@EXAMPLE.COM. ❌ Not found: MISSING@EXAMPLE.COM"
+    }
+"""
+
+@users_bp.route("/users", methods=["DELETE"])
+@jwt_required()
+def delete_users():
+    db = current_app.config["DB"]
+    data = request.get_json()
+    if not data or not isinstance(data, dict) or data == {}:
+        return _json_response({"msg": "❌ Body cannot be empty"}, 400)
+
+    emails = data.get("emails")
+    force = data.get("force", False)
+
+    if not emails or not isinstance(emails, list):
+        return _json_response({"msg": "❌ 'emails' must be a non-empty list of email strings"}, 400)
+    if force is not True:
+        return _json_response({"msg": "❌ You must confirm deletion with 'force': true"}, 400)
+
+    normalized_emails = [email.strip().upper() for email in emails if isinstance(email, str) and email.strip()]
+    if not normalized_emails:
+        return _json_response({"msg": "❌ 'emails' list is empty or invalid"}, 400)
+
+    # One lookup, one store sync and one delete for the whole list (duplicates collapsed, order kept)
+    normalized_emails = list(dict.fromkeys(normalized_emails))
+    # Malformed addresses can't belong to a user (create/update validate them), so only
+    # well-formed ones are sent to Mongo; the rest are reported as not found
+    lookup = [e for e in normalized_emails if is_valid_email(e)]
+    found = set()
+    if lookup:
+        found = {d["email"] for d in db.users.find({"email": {"$in": lookup}}, {"_id": 0, "email": 1})}
+    deleted = [e for e in normalized_emails if e in found]
+    not_found = [e for e in normalized_emails if e not in found]
+
+    if deleted:
+        # Remove users from all stores (acknowledged but unjournaled, like the camera
+        # store sync); the user deletes below keep the default write concern
+        db.stores.with_options(write_concern=stores_sync_concern).update_many(
+            {"users": {"$in": deleted}},
+            {"$pull": {"users": {"$in": deleted}}}
+        )
+
+        # Delete users
+        db.users.delete_many({"email": {"$in": deleted}})
+
+    msg_parts = []
+    if deleted:
+        msg_parts.append(f"✅ Deleted users: {', '.join(deleted)}")
+    if not_found:
+        msg_parts.append(f"❌ Not found: {', '.join(not_found)}")
+
+    return _json_response({"msg": ". ".join(msg_parts)})
 
@@ -0,0 +1,47 @@
+"""
+validation.py — Request-value helpers shared by the route blueprints
+
+Names, emails and the other matched fields are stored stripped and uppercased, and all
+blueprints accept the same email format, so both live here instead of in each module.
+"""
+from functools import lru_cache
+import string
+
+# Email format check (case-insensitive, German letters allowed): LOCAL@DOMAIN.TLD using
+# the same character classes as the old regex, split on "@" and the last "." instead of backtracking
+email_local_chars = frozenset(string.ascii_letters + string.digits + "._%+-äöüßÄÖÜ")
+email_domain_chars = frozenset(string.ascii_letters + string.digits + ".-äöüßÄÖÜ")
+email_tld_chars = frozenset(string.ascii_letters)
+
+
+def is_valid_email(email):
+    local, _, domain = email.partition("@")
+    host, dot, tld = domain.rpartition(".")
+    return (
+        bool(local) and bool(host) and bool(dot) and len(tld) >= 2
+        and set(local) <= email_local_chars
+        and set(host) <= email_domain_chars
+        and set(tld) <= email_tld_chars
+    )
+
+# Longest value norm caches; the cache holds at most 8192 entries of at most this length
+UP_CACHE_MAX_LEN = 320
+
+
+@lru_cache(maxsize=8192)
+def _up_cached(value):
+    return value.strip().upper()
+
+
+def norm(value):
+    """
+    Strip and uppercase a request value in one place; non-strings become "". Short
+    values are cached so repeated ones (the same clientID, store name, ...) share one
+    string instead of allocating a new one per request; longer ones are converted
+    without caching, so request bodies can't fill the cache with large strings.
+    """
+    if not isinstance(value, str):
+        return ""
+    if len(value) > UP_CACHE_MAX_LEN:
+        return value.strip().upper()
+    return _up_cached(value)